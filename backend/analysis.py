@@ -1,6 +1,7 @@
 from typing import List, Dict, Optional
 from datetime import datetime, timedelta
 from riot_api import RiotAPIClient, get_rank_tier, compare_ranks, is_higher_rank
+from match_record import MatchRecord
 import statistics
 
 def extract_players_from_matches(matches: List[Dict], your_puuid: str) -> List[Dict]:
@@ -30,95 +31,157 @@ def extract_players_from_matches(matches: List[Dict], your_puuid: str) -> List[D
     
     return list(players.values())
 
-def calculate_player_stats(matches: List[Dict], puuid: str) -> Dict:
-    """Calculate aggregate stats for a player"""
-    stats = {
-        'total_games': 0,
-        'wins': 0,
-        'kills': [],
-        'deaths': [],
-        'assists': [],
-        'cs': [],
-        'game_durations': [],
-        'vision_scores': [],
-        'damage_share': [],
-        'win_streaks': [],
-        'loss_streaks': [],
-        'champions': {}
-    }
-    
-    current_win_streak = 0
-    current_loss_streak = 0
-    
-    for match in matches:
-        if not match or 'info' not in match:
-            continue
-        
-        # Find this player in the match
-        player_data = None
-        for p in match['info']['participants']:
-            if p.get('puuid') == puuid:
-                player_data = p
-                break
-        
-        if not player_data:
-            continue
+class StatsAccumulator:
+    """Online version of calculate_player_stats + aggregate_stats
+
+    Matches (raw dicts or MatchRecords) are folded in one at a time with
+    add(), in the same order calculate_player_stats would see them, and can
+    be dropped straight after. raw_stats() and snapshot() give the results for everything
+    added so far.
+    """
+
+    def __init__(self, puuid: str):
+        self.puuid = puuid
+        self.stats = {
+            'total_games': 0,
+            'wins': 0,
+            'kills': [],
+            'deaths': [],
+            'assists': [],
+            'cs': [],
+            'game_durations': [],
+            'vision_scores': [],
+            'damage_share': [],
+            'win_streaks': [],
+            'loss_streaks': [],
+            'champions': {}
+        }
+        self.current_win_streak = 0
+        self.current_loss_streak = 0
+        # Results and start time at both ends, for merging with other runs
+        self.first_win = None
+        self.last_win = None
+        self.first_game_start = None
+
+    def add(self, match) -> bool:
+        """Fold in one match (a MatchRecord or a raw match-v5 dict)
+
+        Returns False if the player isn't in it.
+        """
+        stats = self.stats
+        record = match if isinstance(match, MatchRecord) else MatchRecord.from_match(match, self.puuid)
+        if not record:
+            return False
         
         stats['total_games'] += 1
+        if self.first_win is None:
+            self.first_win = record.win
+            self.first_game_start = record.game_creation // 1000
+        self.last_win = record.win
         
         # Win/Loss tracking
-        if player_data.get('win'):
+        if record.win:
             stats['wins'] += 1
-            current_win_streak += 1
-            if current_loss_streak > 0:
-                stats['loss_streaks'].append(current_loss_streak)
-                current_loss_streak = 0
+            self.current_win_streak += 1
+            if self.current_loss_streak > 0:
+                stats['loss_streaks'].append(self.current_loss_streak)
+                self.current_loss_streak = 0
         else:
-            current_loss_streak += 1
-            if current_win_streak > 0:
-                stats['win_streaks'].append(current_win_streak)
-                current_win_streak = 0
+            self.current_loss_streak += 1
+            if self.current_win_streak > 0:
+                stats['win_streaks'].append(self.current_win_streak)
+                self.current_win_streak = 0
         
         # KDA stats
-        stats['kills'].append(player_data.get('kills', 0))
-        stats['deaths'].append(player_data.get('deaths', 0))
-        stats['assists'].append(player_data.get('assists', 0))
+        stats['kills'].append(record.kills)
+        stats['deaths'].append(record.deaths)
+        stats['assists'].append(record.assists)
         
         # CS stats
-        total_cs = player_data.get('totalMinionsKilled', 0) + player_data.get('neutralMinionsKilled', 0)
-        game_duration_min = match['info'].get('gameDuration', 0) / 60
+        total_cs = record.total_minions_killed + record.neutral_minions_killed
+        game_duration_min = record.game_duration / 60
         if game_duration_min > 0:
             stats['cs'].append(total_cs / game_duration_min)
             stats['game_durations'].append(game_duration_min)
         
         # Vision
-        stats['vision_scores'].append(player_data.get('visionScore', 0))
+        stats['vision_scores'].append(record.vision_score)
         
         # Damage share
-        team_id = player_data.get('teamId')
-        team_damage = sum(p.get('totalDamageDealtToChampions', 0) 
-                         for p in match['info']['participants'] 
-                         if p.get('teamId') == team_id)
-        player_damage = player_data.get('totalDamageDealtToChampions', 0)
-        
-        if team_damage > 0:
-            stats['damage_share'].append((player_damage / team_damage) * 100)
+        if record.team_damage > 0:
+            stats['damage_share'].append((record.damage_to_champions / record.team_damage) * 100)
         
         # Champion tracking
-        champ = player_data.get('championName', 'Unknown')
+        champ = record.champion_name
         if champ not in stats['champions']:
             stats['champions'][champ] = {'games': 0, 'wins': 0}
         stats['champions'][champ]['games'] += 1
-        if player_data.get('win'):
+        if record.win:
             stats['champions'][champ]['wins'] += 1
-    
-    # Add final streaks
-    if current_win_streak > 0:
-        stats['win_streaks'].append(current_win_streak)
-    if current_loss_streak > 0:
-        stats['loss_streaks'].append(current_loss_streak)
-    
-    return stats
+
+        return True
+
+    def raw_stats(self) -> Dict:
+        """Raw stats so far, in the shape calculate_player_stats returns"""
+        stats = dict(self.stats)
+        
+        # Add final streaks
+        stats['win_streaks'] = list(self.stats['win_streaks'])
+        stats['loss_streaks'] = list(self.stats['loss_streaks'])
+        if self.current_win_streak > 0:
+            stats['win_streaks'].append(self.current_win_streak)
+        if self.current_loss_streak > 0:
+            stats['loss_streaks'].append(self.current_loss_streak)
+        
+        return stats
+
+    def snapshot(self) -> Dict:
+        """Aggregated stats so far, in the shape aggregate_stats returns"""
+        return aggregate_stats(self.raw_stats())
+
+def calculate_player_stats(matches: List, puuid: str) -> Dict:
+    """Calculate aggregate stats for a player (from raw matches or MatchRecords)"""
+    accumulator = StatsAccumulator(puuid)
+    for match in matches:
+        accumulator.add(match)
+    return accumulator.raw_stats()
+
+def merge_player_stats(newer: Dict, older: Dict, newer_oldest_win: bool, older_newest_win: bool) -> Dict:
+    """Fold raw stats for newer games in front of raw stats for older games
+
+    Both dicts are in the shape calculate_player_stats produces, which lists
+    everything newest game first. If the oldest newer game and the newest
+    older game had the same result, the streak running across the boundary
+    is one streak rather than two.
+    """
+    merged = {
+        'total_games': newer['total_games'] + older['total_games'],
+        'wins': newer['wins'] + older['wins'],
+        'champions': {}
+    }
+
+    for key in ('kills', 'deaths', 'assists', 'cs', 'game_durations', 'vision_scores', 'damage_share'):
+        merged[key] = newer[key] + older[key]
+
+    # The boundary streak is the last one closed in newer (its oldest) and the
+    # first one closed in older (its newest)
+    boundary = None
+    if newer_oldest_win == older_newest_win:
+        boundary = 'win_streaks' if newer_oldest_win else 'loss_streaks'
+    for key in ('win_streaks', 'loss_streaks'):
+        if key == boundary:
+            merged[key] = newer[key][:-1] + [newer[key][-1] + older[key][0]] + older[key][1:]
+        else:
+            merged[key] = newer[key] + older[key]
+
+    for source in (newer, older):
+        for champ, data in source['champions'].items():
+            if champ not in merged['champions']:
+                merged['champions'][champ] = {'games': 0, 'wins': 0}
+            merged['champions'][champ]['games'] += data['games']
+            merged['champions'][champ]['wins'] += data['wins']
+
+    return merged
 
 def aggregate_stats(stats: Dict) -> Dict:
     """Calculate averages and aggregates from raw stats"""
@@ -183,7 +246,7 @@ def is_valid_comparison(riot_client: RiotAPIClient, player: Dict, your_role: str
         # Get recent matches
         match_ids = riot_client.get_match_ids(player['puuid'], count=100)
         
-        if len(match_ids) < 50:
+        if not match_ids or len(match_ids) < 50:
             return False
         
         # Check recency (last game within 30 days)
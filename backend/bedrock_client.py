@@ -1,28 +1,414 @@
+import asyncio
 import boto3
+import copy
+import hashlib
 import json
 import os
-from typing import Dict, Optional
+import re
+import threading
+import time
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from botocore.config import Config
+
+from bedrock_invoker import BedrockInvoker
+from cache import TTLCache
+from metrics import BEDROCK_FALLBACKS, BEDROCK_FIRST_POSTCARD_SECONDS, BEDROCK_REQUEST_SECONDS
+from roast_templates import render_postcards
+
+
+def postcard_cache_key(model_id: str, your_stats: Dict, your_rank: str, achievements: list, used_topics: list,
+                       sample_truncated: bool) -> str:
+    """Hash of everything that goes into a postcard prompt.
+
+    Serialized with sorted keys so equal inputs always hash the same; the
+    order topics were used in doesn't change what we ask for.
+    """
+    canonical = json.dumps({
+        'model_id': model_id,
+        'your_stats': your_stats,
+        'your_rank': your_rank,
+        'achievements': achievements,
+        'used_topics': sorted(set(used_topics)),
+        'sample_truncated': bool(sample_truncated)
+    }, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def parse_postcards_response(content: str) -> Tuple[List[Dict], List[str]]:
+    """Parse the model's JSON answer into (postcards, topics)"""
+    content = content.strip()
+
+    # Clean up markdown
+    if content.startswith('```json'):
+        content = content.replace('```json', '').replace('```', '').strip()
+
+    result = json.loads(content)
+
+    # Handle both old format (array) and new format (object with postcards/topics)
+    if isinstance(result, list):
+        # Old format - just postcards array
+        return result, []
+    # New format - object with postcards and topics
+    return result.get('postcards', []), result.get('topics', [])
+
+
+class PostcardStreamParser:
+    """Picks complete postcard objects out of the model's JSON while it streams.
+
+    Feed it text as it arrives; each call returns the postcards that were
+    completed by that text. Scans for the postcards array (or a bare array,
+    the old format) and tracks brace depth outside of strings, so a postcard
+    is parsed as soon as its closing brace shows up.
+    """
+
+    _ARRAY_START = re.compile(r'"postcards"\s*:\s*\[|^\s*(?:```(?:json)?\s*)?\[')
 
-class BedrockClient:
     def __init__(self):
+        self.text = ''
+        self._pos = None  # Scan position, once we're inside the array
+        self._closed = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._start = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        self.text += text
+        if self._closed:
+            return []
+        if self._pos is None:
+            match = self._ARRAY_START.search(self.text)
+            if not match:
+                return []
+            self._pos = match.end()
+
+        postcards = []
+        while self._pos < len(self.text) and not self._closed:
+            char = self.text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        postcards.append(json.loads(self.text[self._start:self._pos + 1]))
+                    except ValueError:
+                        pass  # Left for the full parse at the end
+            elif char == ']' and self._depth == 0:
+                self._closed = True
+            self._pos += 1
+        return postcards
+
+
+class BedrockClient:
+    def __init__(self, postcard_cache: Optional[TTLCache] = None, cache_candidates: int = 3,
+                 invoker: Optional[BedrockInvoker] = None, max_pool_connections: int = 10,
+                 deadline_seconds: float = 10, swap_seconds: float = 20):
         self.client = boto3.client(
             'bedrock-runtime',
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
             aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_REGION', 'us-east-1')
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+            # Throttling is retried by the invoker with a shared backoff;
+            # botocore retrying underneath it would multiply the attempts
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={'mode': 'standard', 'total_max_attempts': 1}
+            )
         )
+        self.invoker = invoker or BedrockInvoker()
+
+        # The *_hedged methods serve template postcards if the model hasn't
+        # answered within deadline_seconds (0 waits as long as it takes)
+        self.deadline_seconds = deadline_seconds
+        self.swap_seconds = swap_seconds
+        self.hedged = 0
+        # Generations running on the invoker, by postcard_cache_key
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.coalesced = 0
         # Use cross-region inference profile instead of direct model ID
         # This is required as of late 2024
         self.model_id = 'us.anthropic.claude-3-5-sonnet-20241022-v2:0'
-    
-    def generate_year_review_postcards(self, your_stats: Dict, your_rank: str, achievements: list, used_topics: list = None) -> tuple:
+
+        # Identical requests (a popular profile being refreshed) are served
+        # from up to cache_candidates earlier generations, in rotation
+        self.postcard_cache = postcard_cache if cache_candidates > 0 else None
+        self.cache_candidates = cache_candidates
+        self.cache_served = 0
+        self.cache_generated = 0
+        self._cache_lock = threading.Lock()
+
+    def cache_stats(self) -> Dict:
+        """Postcard cache counters; served_rate is the share of requests that skipped the model"""
+        if self.postcard_cache is None:
+            return {}
+        requests = self.cache_served + self.cache_generated
+        return {
+            **self.postcard_cache.stats(),
+            'served': self.cache_served,
+            'generated': self.cache_generated,
+            'served_rate': round(self.cache_served / requests, 3) if requests else 0
+        }
+
+    def _next_cached(self, key: str) -> Optional[Tuple[List[Dict], List[str]]]:
+        """The next cached generation for key, once it has a full set of candidates"""
+        if self.postcard_cache is None:
+            return None
+        with self._cache_lock:
+            entry = self.postcard_cache.get(key)
+            if not entry or len(entry['candidates']) < self.cache_candidates:
+                self.cache_generated += 1
+                return None
+            candidate = entry['candidates'][entry['next'] % len(entry['candidates'])]
+            entry['next'] += 1
+            self.cache_served += 1
+        return copy.deepcopy(candidate)
+
+    def _store_candidate(self, key: str, postcards: List[Dict], topics: List[str]) -> None:
+        if self.postcard_cache is None:
+            return
+        with self._cache_lock:
+            entry = self.postcard_cache.get(key)
+            if entry is None:
+                entry = {'candidates': [], 'next': 0}
+                self.postcard_cache.set(key, entry)
+            if len(entry['candidates']) < self.cache_candidates:
+                entry['candidates'].append(copy.deepcopy((postcards, topics)))
+
+    def generate_year_review_postcards(self, your_stats: Dict, your_rank: str, achievements: list, used_topics: list = None,
+                                       sample_truncated: Optional[bool] = None) -> tuple:
         """Generate 5-7 funny postcards for year-in-review mode
 
+        sample_truncated says the stats don't cover every game they played
+        this season; None falls back to guessing from the game count.
+
         Returns: (postcards, used_topics)
         """
         if used_topics is None:
             used_topics = []
+        if sample_truncated is None:
+            # Old callers: 99-100 games means we hit the old 100 game limit
+            sample_truncated = your_stats.get('total_games', 0) >= 99
+
+        cache_key = postcard_cache_key(self.model_id, your_stats, your_rank, achievements, used_topics, sample_truncated)
+        cached = self._next_cached(cache_key)
+        if cached:
+            return cached
+
+        started = time.monotonic()
+        try:
+            postcards, topics = self._invoke(self._prompt(your_stats, your_rank, used_topics, sample_truncated))
+            BEDROCK_REQUEST_SECONDS.observe(time.monotonic() - started, operation='invoke', outcome='success')
+            self._store_candidate(cache_key, postcards, topics)
+            return postcards, topics
+        except Exception as e:
+            print(f"Error generating year review postcards: {e}")
+            BEDROCK_REQUEST_SECONDS.observe(time.monotonic() - started, operation='invoke', outcome='error')
+            BEDROCK_FALLBACKS.inc(reason='error')
+            return render_postcards(your_stats, your_rank, achievements, used_topics, sample_truncated)
+
+    async def generate_year_review_postcards_async(self, your_stats: Dict, your_rank: str, achievements: list,
+                                                   used_topics: list = None,
+                                                   sample_truncated: Optional[bool] = None) -> tuple:
+        """generate_year_review_postcards on the invoker's worker pool
+
+        Identical requests made while one is being generated wait for it
+        and get a copy of its postcards, rather than a model call each.
+        """
+        key = postcard_cache_key(self.model_id, your_stats, your_rank, achievements, used_topics or [], sample_truncated)
+        generation = self._in_flight.get(key)
+        if generation is None:
+            generation = asyncio.ensure_future(self.invoker.submit(
+                self.generate_year_review_postcards, your_stats, your_rank, achievements, used_topics,
+                sample_truncated=sample_truncated))
+            self._in_flight[key] = generation
+            generation.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return copy.deepcopy(await asyncio.shield(generation))
+
+    async def stream_year_review_postcards_async(self, *args, **kwargs) -> AsyncIterator[Tuple[str, object]]:
+        """stream_year_review_postcards, consumed without blocking the event loop"""
+        async for item in self.invoker.iterate(self.stream_year_review_postcards(*args, **kwargs)):
+            yield item
+
+    async def generate_year_review_postcards_hedged(self, your_stats: Dict, your_rank: str, achievements: list,
+                                                    used_topics: list = None,
+                                                    sample_truncated: Optional[bool] = None) -> tuple:
+        """generate_year_review_postcards_async, or template postcards once the deadline passes
+
+        A model call that misses the deadline keeps running; if it succeeds
+        its postcards land in the cache for the next request.
+        """
+        generation = asyncio.ensure_future(self.generate_year_review_postcards_async(
+            your_stats, your_rank, achievements, used_topics, sample_truncated=sample_truncated))
+        if not self.deadline_seconds:
+            return await generation
+        try:
+            return await asyncio.wait_for(asyncio.shield(generation), self.deadline_seconds)
+        except asyncio.TimeoutError:
+            self.hedged += 1
+            BEDROCK_FALLBACKS.inc(reason='deadline')
+            print(f"Bedrock missed the {self.deadline_seconds}s deadline, serving template postcards")
+            return render_postcards(your_stats, your_rank, achievements, used_topics, bool(sample_truncated))
 
+    async def stream_year_review_postcards_hedged(self, your_stats: Dict, your_rank: str, achievements: list,
+                                                  used_topics: list = None,
+                                                  sample_truncated: Optional[bool] = None) -> AsyncIterator[Tuple[str, object]]:
+        """stream_year_review_postcards_async with a deadline on the first postcard
+
+        If the model hasn't produced a postcard within deadline_seconds, the
+        template postcards are yielded instead (as ('postcard', ...) and
+        ('topics', ...) like the model's). We then give the model up to
+        swap_seconds more; if it finishes, its batch follows as
+        ('swap', (postcards, topics)). If the stream fails after its first
+        postcard, or stalls past deadline_seconds + swap_seconds, template
+        postcards make up the rest.
+        """
+        items = asyncio.Queue()
+        # Past this the rest of the stream isn't worth waiting for (None: no limit)
+        give_up_at = time.monotonic() + self.deadline_seconds + max(self.swap_seconds, 0) if self.deadline_seconds else None
+
+        async def consume():
+            try:
+                async for item in self.stream_year_review_postcards_async(
+                        your_stats, your_rank, achievements, used_topics, sample_truncated=sample_truncated):
+                    await items.put(item)
+            except Exception as e:
+                print(f"Error streaming year review postcards: {e}")
+                await items.put(('error', e))
+
+        async def next_item(timeout: Optional[float]):
+            """The next item from the model, or None if it didn't come in time"""
+            try:
+                return await asyncio.wait_for(items.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        def remaining() -> Optional[float]:
+            return max(0.0, give_up_at - time.monotonic()) if give_up_at is not None else None
+
+        consumer = asyncio.ensure_future(consume())
+        try:
+            item = await next_item(self.deadline_seconds or None)
+
+            if item is not None and item[0] != 'error':
+                # The model made it in time - pass everything through while it keeps coming
+                sent = []
+                while item is not None and item[0] == 'postcard':
+                    sent.append(item[1])
+                    yield item
+                    item = await next_item(remaining())
+                if item is not None and item[0] == 'topics':
+                    yield item
+                    return
+                # It stalled or failed partway: keep what went out, top up with templates
+                BEDROCK_FALLBACKS.inc(reason='deadline' if item is None else 'error')
+                print(f"Bedrock stream stopped after {len(sent)} postcards, finishing with template postcards")
+                postcards, topics = render_postcards(your_stats, your_rank, achievements, used_topics,
+                                                     bool(sample_truncated))
+                for postcard in postcards[len(sent):]:
+                    yield ('postcard', postcard)
+                yield ('topics', topics)
+                return
+
+            if item is None:
+                self.hedged += 1
+                BEDROCK_FALLBACKS.inc(reason='deadline')
+                print(f"Bedrock missed the {self.deadline_seconds}s deadline, serving template postcards")
+            else:
+                BEDROCK_FALLBACKS.inc(reason='error')
+            postcards, topics = render_postcards(your_stats, your_rank, achievements, used_topics, bool(sample_truncated))
+            for postcard in postcards:
+                yield ('postcard', postcard)
+            yield ('topics', topics)
+
+            # Nothing to swap in if the model failed
+            if item is not None or self.swap_seconds <= 0:
+                return
+
+            async def collect():
+                model_postcards = []
+                while True:
+                    kind, value = await items.get()
+                    if kind == 'error':
+                        return None
+                    if kind == 'topics':
+                        return model_postcards, value
+                    model_postcards.append(value)
+
+            try:
+                swap = await asyncio.wait_for(collect(), self.swap_seconds)
+            except asyncio.TimeoutError:
+                swap = None
+            if swap is not None:
+                yield ('swap', swap)
+        finally:
+            # The model call itself carries on in its thread and fills the cache
+            consumer.cancel()
+
+    def stream_year_review_postcards(self, your_stats: Dict, your_rank: str, achievements: list,
+                                     used_topics: list = None,
+                                     sample_truncated: Optional[bool] = None) -> Iterator[Tuple[str, object]]:
+        """Same as generate_year_review_postcards, but streamed from the model
+
+        Yields ('postcard', postcard) as soon as each one has been generated,
+        then ('topics', topics) once the response is complete.
+        """
+        if used_topics is None:
+            used_topics = []
+        if sample_truncated is None:
+            sample_truncated = your_stats.get('total_games', 0) >= 99
+
+        cache_key = postcard_cache_key(self.model_id, your_stats, your_rank, achievements, used_topics, sample_truncated)
+        cached = self._next_cached(cache_key)
+        if cached:
+            for postcard in cached[0]:
+                yield ('postcard', postcard)
+            yield ('topics', cached[1])
+            return
+
+        parser = PostcardStreamParser()
+        sent = []
+        started = time.monotonic()
+        try:
+            for text in self._invoke_stream(self._prompt(your_stats, your_rank, used_topics, sample_truncated)):
+                for postcard in parser.feed(text):
+                    if not sent:
+                        BEDROCK_FIRST_POSTCARD_SECONDS.observe(time.monotonic() - started)
+                    sent.append(postcard)
+                    yield ('postcard', postcard)
+            postcards, topics = parse_postcards_response(parser.text)
+            BEDROCK_REQUEST_SECONDS.observe(time.monotonic() - started, operation='stream', outcome='success')
+            self._store_candidate(cache_key, postcards, topics)
+        except Exception as e:
+            print(f"Error streaming year review postcards: {e}")
+            BEDROCK_REQUEST_SECONDS.observe(time.monotonic() - started, operation='stream', outcome='error')
+            # Whatever they've already seen stays; fall back only if that's nothing
+            if sent:
+                postcards, topics = sent, []
+            else:
+                BEDROCK_FALLBACKS.inc(reason='error')
+                postcards, topics = render_postcards(your_stats, your_rank, achievements, used_topics, sample_truncated)
+
+        for postcard in postcards[len(sent):]:
+            yield ('postcard', postcard)
+        yield ('topics', topics)
+
+    def _prompt(self, your_stats: Dict, your_rank: str, used_topics: list, sample_truncated: bool) -> str:
+        """The postcard prompt for these stats"""
         top_champ = your_stats.get('top_champions', [{}])[0].get('name', 'Unknown') if your_stats.get('top_champions') else 'Unknown'
         top_champ_games = your_stats.get('top_champions', [{}])[0].get('games', 0) if your_stats.get('top_champions') else 0
         top_champ_wr = your_stats.get('top_champions', [{}])[0].get('win_rate', 0) if your_stats.get('top_champions') else 0
@@ -41,13 +427,13 @@ class BedrockClient:
         if used_topics:
             avoid_topics = f"\n\nDON'T REPEAT THESE TOPICS (already roasted):\n{', '.join(used_topics)}\n\nPick DIFFERENT stats to roast."
 
-        # Only warn about sample size if we got 99-100 games (means we hit the limit and they likely played more)
+        # Only warn about sample size if we didn't get all of their games
         sample_warning = ""
         total_games = your_stats.get('total_games', 0)
-        if total_games >= 99:
-            sample_warning = f"\n\nIMPORTANT: We only grabbed their last 100 games from 2025, so they likely played way more than {total_games} total. Don't roast them about only playing {total_games} games."
+        if sample_truncated:
+            sample_warning = f"\n\nIMPORTANT: We only grabbed their last {total_games} games from 2025, so they likely played way more than {total_games} total. Don't roast them about only playing {total_games} games."
 
-        prompt = f"""Write 5-7 funny roasts about this player's 2025 ranked season. Mix dry wit with occasional dad joke energy - the kind that's so stupid it's funny.{avoid_topics}{sample_warning}
+        return f"""Write 5-7 funny roasts about this player's 2025 ranked season. Mix dry wit with occasional dad joke energy - the kind that's so stupid it's funny.{avoid_topics}{sample_warning}
 
 IMPORTANT: The current year is 2025. Reference stats as being from 2025, not 2024.
 
@@ -78,63 +464,41 @@ Return JSON object with:
 Output ONLY valid JSON in this format:
 {{"postcards": [...], "topics": ["...", "..."]}}"""
 
-        try:
-            request_body = {
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 2000,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 1.0
-            }
-
-            response = self.client.invoke_model(
-                modelId=self.model_id,
-                body=json.dumps(request_body)
-            )
-
-            response_body = json.loads(response['body'].read())
-            content = response_body['content'][0]['text'].strip()
-
-            # Clean up markdown
-            if content.startswith('```json'):
-                content = content.replace('```json', '').replace('```', '').strip()
-
-            result = json.loads(content)
+    def _request_body(self, prompt: str) -> str:
+        return json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": 2000,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 1.0
+        })
 
-            # Handle both old format (array) and new format (object with postcards/topics)
-            if isinstance(result, list):
-                # Old format - just postcards array
-                postcards = result
-                topics = []
-            else:
-                # New format - object with postcards and topics
-                postcards = result.get('postcards', [])
-                topics = result.get('topics', [])
+    def _invoke(self, prompt: str) -> Tuple[List[Dict], List[str]]:
+        """Call the model and parse its postcards and topics"""
+        response = self.invoker.invoke(
+            self.client.invoke_model,
+            modelId=self.model_id,
+            body=self._request_body(prompt)
+        )
 
-            return postcards, topics
+        response_body = json.loads(response['body'].read())
+        return parse_postcards_response(response_body['content'][0]['text'])
 
-        except Exception as e:
-            print(f"Error generating year review postcards: {e}")
-            # Fallback postcards
-            return ([
-                {
-                    "title": "2025 RECAP",
-                    "content": "Let's talk about your year.",
-                    "type": "intro"
-                },
-                {
-                    "title": "THE NUMBERS",
-                    "content": f"{your_stats.get('total_games', 0)} games. {your_stats.get('win_rate', 0)}% winrate. {your_rank}.",
-                    "stat": f"{your_rank}",
-                    "type": "stat"
-                },
-                {
-                    "title": f"{top_champ.upper()} MAIN",
-                    "content": f"{top_champ_games} games on {top_champ}. {top_champ_wr}% winrate. They said you couldn't do it. They were right.",
-                    "type": "roast"
-                }
-            ], [])
\ No newline at end of file
+    def _invoke_stream(self, prompt: str) -> Iterator[str]:
+        """Call the model with response streaming, yielding text as it's generated"""
+        with self.invoker.stream(
+            self.client.invoke_model_with_response_stream,
+            modelId=self.model_id,
+            body=self._request_body(prompt)
+        ) as response:
+            for event in response['body']:
+                chunk = event.get('chunk')
+                if not chunk:
+                    continue
+                data = json.loads(chunk['bytes'])
+                if data.get('type') == 'content_block_delta' and data['delta'].get('type') == 'text_delta':
+                    yield data['delta']['text']
@@ -0,0 +1,166 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Iterator
+
+from botocore.exceptions import ClientError
+
+# Error codes that mean "slow down", not "this request is bad"
+THROTTLING_ERRORS = {
+    'ThrottlingException',
+    'TooManyRequestsException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+
+def is_throttling_error(error: Exception) -> bool:
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') in THROTTLING_ERRORS
+
+
+class BedrockInvoker:
+    """Runs Bedrock calls off the event loop, within limits Bedrock can take.
+
+    Blocking work (prompt building plus the boto3 call) runs on a bounded
+    worker pool, and at most max_in_flight model calls are open at once;
+    everything else waits its turn and shows up in queue_depth. Throttling
+    errors put every caller into a shared cooldown that doubles on each
+    throttle and halves on each success, so a burst backs off together
+    instead of retrying in lockstep.
+    """
+
+    def __init__(self, max_workers: int = 8, max_in_flight: int = 8, max_retries: int = 4,
+                 base_delay: float = 0.5, max_delay: float = 8.0):
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self.retries = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bedrock')
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._queued = 0       # Submitted, waiting for a worker
+        self._waiting = 0      # Waiting for an in-flight slot
+        self._in_flight = 0
+        self._delay = 0.0
+        self._cooldown_until = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queued + self._waiting
+
+    def stats(self) -> Dict:
+        return {
+            'max_workers': self.max_workers,
+            'max_in_flight': self.max_in_flight,
+            'in_flight': self._in_flight,
+            'queued': self._queued,
+            'waiting_for_slot': self._waiting,
+            'queue_depth': self.queue_depth,
+            'throttled': self.throttled,
+            'retries': self.retries,
+            'backoff_seconds': round(self._delay, 2)
+        }
+
+    def invoke(self, operation: Callable, **kwargs):
+        """Call a bedrock-runtime operation, waiting out throttling"""
+        with self._slot():
+            return self._with_backoff(operation, kwargs)
+
+    @contextmanager
+    def stream(self, operation: Callable, **kwargs):
+        """Like invoke, but keeps the in-flight slot until the response has been read"""
+        with self._slot():
+            yield self._with_backoff(operation, kwargs)
+
+    async def submit(self, fn: Callable, *args, **kwargs):
+        """Run blocking Bedrock work on the worker pool without blocking the event loop"""
+        with self._lock:
+            self._queued += 1
+
+        def run():
+            with self._lock:
+                self._queued -= 1
+            return fn(*args, **kwargs)
+
+        return await asyncio.get_running_loop().run_in_executor(self._executor, run)
+
+    async def iterate(self, iterator: Iterator) -> AsyncIterator:
+        """Consume a blocking iterator (e.g. a response stream) from async code.
+
+        The iterator gets a thread of its own rather than a pool worker: it
+        holds an in-flight slot for as long as it's read, and the workers may
+        all be waiting for one.
+        """
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        done = object()
+
+        def pump():
+            try:
+                for item in iterator:
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            finally:
+                loop.call_soon_threadsafe(items.put_nowait, done)
+
+        pumping = loop.run_in_executor(None, pump)
+        while True:
+            item = await items.get()
+            if item is done:
+                break
+            yield item
+        await pumping
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    @contextmanager
+    def _slot(self):
+        with self._lock:
+            self._waiting += 1
+        self._slots.acquire()
+        with self._lock:
+            self._waiting -= 1
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            self._slots.release()
+
+    def _with_backoff(self, operation: Callable, kwargs: Dict):
+        attempt = 0
+        while True:
+            wait = self._cooldown_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            try:
+                result = operation(**kwargs)
+            except Exception as e:
+                if not is_throttling_error(e):
+                    raise
+                with self._lock:
+                    self.throttled += 1
+                    self._delay = min(self.max_delay, max(self.base_delay, self._delay * 2))
+                    # Jitter so the waiting callers don't all come back at once
+                    self._cooldown_until = max(self._cooldown_until,
+                                               time.monotonic() + self._delay * random.uniform(0.5, 1.0))
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self.retries += 1
+                print(f"Bedrock throttled ({e.response['Error']['Code']}), retry {attempt}/{self.max_retries} "
+                      f"after {self._delay:.1f}s backoff")
+                continue
+
+            with self._lock:
+                self._delay = self._delay / 2 if self._delay / 2 >= self.base_delay else 0.0
+            return result
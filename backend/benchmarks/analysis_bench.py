@@ -0,0 +1,328 @@
+"""Scaling benchmarks for the analysis engine.
+
+For each case (a synthetic corpus of N matches among P players) this times
+and memory-profiles extract_players_from_matches, calculate_player_stats
+(on raw matches and on MatchRecords), aggregate_stats and
+detect_achievements for every player, plus the columnar batch path when
+NumPy is installed, and turning real-sized match payloads into
+MatchRecords. Before timing anything it checks that every optimized path
+(MatchRecords, orjson parsing, columnar, incremental merging) gives
+exactly the output of the original code in benchmarks.reference.
+
+    cd backend
+    python -m benchmarks.analysis_bench --output before.json
+    python -m benchmarks.analysis_bench --output after.json --compare before.json
+
+Exits non-zero if an equivalence check fails or, with --compare, a timing
+or peak memory got worse by more than --tolerance.
+"""
+import argparse
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import orjson
+
+from analysis import (
+    StatsAccumulator,
+    aggregate_stats,
+    calculate_player_stats,
+    detect_achievements,
+    extract_players_from_matches,
+    merge_player_stats
+)
+from match_record import MatchRecord
+from benchmarks import reference
+from benchmarks.synthetic import iter_corpus, puuid_for
+
+try:
+    import numpy as np
+    from columnar import MatchColumns
+except ImportError:
+    np = None
+
+# matches x players, from one player's few games up to a season for a big batch
+DEFAULT_CASES = '10x1,100x1,1000x1,1000x10,10000x10,10000x100,10000x1000,100000x1000,100000x10000'
+
+# A raw match-v5 dict takes ~25KB in memory, so past this many matches only
+# the MatchRecord benchmarks run (the app keeps records, not raw dicts)
+DEFAULT_MAX_RAW_MATCHES = 20000
+
+# Parsing costs the same per match at any corpus size; payloads are real-sized (~60KB)
+DEFAULT_PARSE_MATCHES = 1000
+
+
+class Corpus:
+    """One benchmark case: every player's matches, newest first, as records (and raw dicts if small enough)"""
+
+    def __init__(self, matches: int, players: int, max_raw_matches: int, parse_matches: int, seed: int = 0):
+        self.matches = matches
+        self.players = players
+        self.puuids = [puuid_for(p) for p in range(players)]
+        self.raw: Optional[List[Dict]] = [] if matches <= max_raw_matches else None
+        self.raw_by_player: Optional[Dict[str, List[Dict]]] = (
+            {puuid: [] for puuid in self.puuids} if self.raw is not None else None)
+        self.records: Dict[str, List[MatchRecord]] = {puuid: [] for puuid in self.puuids}
+
+        for match in iter_corpus(matches, players, seed):
+            for puuid, record in MatchRecord.for_players(match, self.puuids).items():
+                self.records[puuid].append(record)
+                if self.raw is not None:
+                    self.raw_by_player[puuid].append(match)
+            if self.raw is not None:
+                self.raw.append(match)
+
+        # Generated oldest first; analysis sees newest first
+        for lists in (self.records, self.raw_by_player or {}):
+            for games in lists.values():
+                games.reverse()
+        if self.raw is not None:
+            self.raw.reverse()
+
+        # Raw bytes of the first few matches, each with the tracked players in it
+        self.payloads = [
+            (json.dumps(match, separators=(',', ':')).encode(),
+             [puuid for puuid in match['metadata']['participants'] if puuid.startswith('bench-')])
+            for match in iter_corpus(min(matches, parse_matches), players, seed, full=True)
+        ]
+
+        self.raw_stats = {puuid: calculate_player_stats(games, puuid) for puuid, games in self.records.items()}
+        self.aggregated = {puuid: aggregate_stats(stats) for puuid, stats in self.raw_stats.items()}
+
+    @property
+    def name(self) -> str:
+        return f'{self.matches}x{self.players}'
+
+    @property
+    def rows(self) -> int:
+        """Player-games in the corpus, the unit per-row timings are quoted in"""
+        return sum(len(games) for games in self.records.values())
+
+
+def benchmarks(corpus: Corpus) -> Dict[str, Callable[[], object]]:
+    """What to time for a case: name -> zero-argument callable"""
+    cases = {}
+    if corpus.raw is not None:
+        cases['extract_players_from_matches'] = lambda: extract_players_from_matches(corpus.raw, corpus.puuids[0])
+        cases['calculate_player_stats[raw]'] = lambda: [
+            calculate_player_stats(games, puuid) for puuid, games in corpus.raw_by_player.items()]
+    cases['parse[json.loads]'] = lambda: [
+        MatchRecord.for_players(json.loads(payload), lobby) for payload, lobby in corpus.payloads]
+    cases['parse[orjson]'] = lambda: [
+        MatchRecord.for_players(orjson.loads(payload), lobby) for payload, lobby in corpus.payloads]
+    cases['calculate_player_stats[records]'] = lambda: [
+        calculate_player_stats(games, puuid) for puuid, games in corpus.records.items()]
+    cases['aggregate_stats'] = lambda: [aggregate_stats(stats) for stats in corpus.raw_stats.values()]
+    cases['detect_achievements'] = lambda: [
+        detect_achievements(corpus.raw_stats[puuid], corpus.aggregated[puuid]) for puuid in corpus.puuids]
+    if np is not None:
+        if corpus.raw is not None:
+            cases['columnar.from_matches'] = lambda: MatchColumns.from_matches(corpus.raw, corpus.puuids)
+        cases['columnar.from_records'] = lambda: MatchColumns.from_records(corpus.records)
+        columns = MatchColumns.from_records(corpus.records)
+        cases['columnar.raw_stats'] = columns.raw_stats
+        cases['columnar.aggregate_stats'] = columns.aggregate_stats
+    return cases
+
+
+def check_equivalence(corpus: Corpus) -> List[str]:
+    """Compare every optimized path against the reference; returns what differs"""
+    failures = []
+
+    def expect(path: str, expected, actual):
+        if expected != actual:
+            mismatched = [p for p in corpus.puuids if expected.get(p) != actual.get(p)]
+            failures.append(f'{corpus.name} {path}: {len(mismatched)} players differ, e.g. {mismatched[:1]}')
+
+    # Reference: the original dict-based calculate_player_stats over raw match dicts.
+    # Corpora too big to keep as dicts are only checked against the MatchRecord path.
+    if corpus.raw is not None:
+        expected = {puuid: reference.calculate_player_stats(games, puuid)
+                    for puuid, games in corpus.raw_by_player.items()}
+        expect('calculate_player_stats[raw]', expected,
+               {puuid: calculate_player_stats(games, puuid) for puuid, games in corpus.raw_by_player.items()})
+        expect('calculate_player_stats[records]', expected, corpus.raw_stats)
+        expected_aggregated = {puuid: aggregate_stats(stats) for puuid, stats in expected.items()}
+    else:
+        expected, expected_aggregated = corpus.raw_stats, corpus.aggregated
+
+    # Records from the raw bytes (orjson) vs from the stdlib parser
+    def fields(records):
+        return {puuid: tuple(getattr(record, name) for name in MatchRecord.__slots__)
+                for puuid, record in records.items()}
+
+    differing = [payload for payload, lobby in corpus.payloads
+                 if fields(MatchRecord.from_payload(payload, lobby)) != fields(
+                     MatchRecord.for_players(json.loads(payload), lobby))]
+    if differing:
+        failures.append(f'{corpus.name} MatchRecord.from_payload: {len(differing)} payloads differ')
+
+    accumulators = {}
+    for puuid, games in corpus.records.items():
+        accumulators[puuid] = StatsAccumulator(puuid)
+        for game in games:
+            accumulators[puuid].add(game)
+    expect('StatsAccumulator.snapshot', expected_aggregated,
+           {puuid: accumulator.snapshot() for puuid, accumulator in accumulators.items()})
+
+    # Incremental re-analysis: newer half merged onto the older half
+    merged = {}
+    for puuid, games in corpus.records.items():
+        if len(games) < 2:
+            merged[puuid] = expected[puuid]
+            continue
+        newer, older = games[:len(games) // 2], games[len(games) // 2:]
+        merged[puuid] = merge_player_stats(calculate_player_stats(newer, puuid), calculate_player_stats(older, puuid),
+                                           newer[-1].win, older[0].win)
+    expect('merge_player_stats', expected, merged)
+
+    if np is not None:
+        columns = MatchColumns.from_records(corpus.records)
+        expect('columnar.raw_stats[records]', expected, columns.raw_stats())
+        expect('columnar.aggregate_stats[records]', expected_aggregated, columns.aggregate_stats())
+        if corpus.raw is not None:
+            columns = MatchColumns.from_matches(corpus.raw, corpus.puuids)
+            expect('columnar.raw_stats[raw]', expected, columns.raw_stats())
+            expect('columnar.aggregate_stats[raw]', expected_aggregated, columns.aggregate_stats())
+    return failures
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict:
+    """Wall time over `repeat` runs, then peak traced memory of one more"""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'median_seconds': statistics.median(times), 'best_seconds': min(times), 'peak_bytes': peak}
+
+
+def compare(results: List[Dict], baseline: Dict, tolerance: float, min_seconds: float) -> List[str]:
+    """Timings and memory peaks that got worse than baseline by more than tolerance"""
+    previous = {(r['case'], r['function']): r for r in baseline.get('results', [])}
+    regressions = []
+    for result in results:
+        old = previous.get((result['case'], result['function']))
+        if not old:
+            continue
+        label = f"{result['case']} {result['function']}"
+        if max(old['median_seconds'], result['median_seconds']) >= min_seconds and \
+                result['median_seconds'] > old['median_seconds'] * (1 + tolerance):
+            regressions.append(f"{label}: {old['median_seconds'] * 1000:.2f}ms -> "
+                               f"{result['median_seconds'] * 1000:.2f}ms")
+        # Small allocations wobble by a few KB between runs
+        if result['peak_bytes'] > old['peak_bytes'] * (1 + tolerance) + 64 * 1024:
+            regressions.append(f"{label}: peak {old['peak_bytes'] / 1e6:.2f}MB -> {result['peak_bytes'] / 1e6:.2f}MB")
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_cases(value: str) -> List[tuple]:
+    cases = []
+    for case in value.split(','):
+        matches, players = case.lower().split('x')
+        cases.append((int(matches), int(players)))
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cases', type=parse_cases, default=parse_cases(DEFAULT_CASES),
+                        help=f'comma-separated MATCHESxPLAYERS (default {DEFAULT_CASES})')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (median reported)')
+    parser.add_argument('--max-raw-matches', type=int, default=DEFAULT_MAX_RAW_MATCHES,
+                        help='largest corpus kept as raw dicts for the raw-input benchmarks')
+    parser.add_argument('--parse-matches', type=int, default=DEFAULT_PARSE_MATCHES,
+                        help='real-sized payloads per case for the parse benchmarks')
+    parser.add_argument('--only', help='only benchmarks whose name contains this')
+    parser.add_argument('--skip-checks', action='store_true', help="don't run the equivalence checks")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run to flag regressions against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before flagging (0.25 = 25%%)')
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help="timings this short on both sides aren't compared (too noisy)")
+    args = parser.parse_args()
+
+    results, failures = [], []
+    print(f"{'case':<13} {'benchmark':<34} {'median ms':>10} {'best ms':>9} {'us/row':>8} {'peak MB':>8}")
+    for matches, players in args.cases:
+        started = time.perf_counter()
+        corpus = Corpus(matches, players, args.max_raw_matches, args.parse_matches, args.seed)
+        print(f"{corpus.name:<13} ({corpus.rows} player-games, generated in {time.perf_counter() - started:.1f}s)")
+
+        if not args.skip_checks:
+            case_failures = check_equivalence(corpus)
+            failures.extend(case_failures)
+            for failure in case_failures:
+                print(f"    MISMATCH {failure}")
+
+        for name, fn in benchmarks(corpus).items():
+            if args.only and args.only not in name:
+                continue
+            result = {'case': corpus.name, 'matches': matches, 'players': players, 'rows': corpus.rows,
+                      'function': name, **measure(fn, args.repeat)}
+            result['us_per_row'] = result['median_seconds'] / max(corpus.rows, 1) * 1e6
+            results.append(result)
+            print(f"{corpus.name:<13} {name:<34} {result['median_seconds'] * 1000:>10.2f} "
+                  f"{result['best_seconds'] * 1000:>9.2f} {result['us_per_row']:>8.2f} "
+                  f"{result['peak_bytes'] / 1e6:>8.2f}")
+        del corpus
+        gc.collect()
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_seconds)
+        print(f"\n{len(regressions)} regression(s) against {args.compare}")
+        for regression in regressions:
+            print(f"    {regression}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'created_at': datetime.now(timezone.utc).isoformat(),
+                    'git_revision': git_revision(),
+                    'python': sys.version.split()[0],
+                    'platform': platform.platform(),
+                    'numpy': np.__version__ if np is not None else None,
+                    'repeat': args.repeat,
+                    'seed': args.seed
+                },
+                'equivalence_failures': failures,
+                'regressions': regressions,
+                'results': results
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if failures:
+        print(f"\n{len(failures)} equivalence check(s) failed")
+    sys.exit(1 if failures or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
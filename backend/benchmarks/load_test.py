@@ -0,0 +1,274 @@
+"""Offline load test: the backend against a mock Riot API and a stub Bedrock.
+
+Starts benchmarks.mock_riot and the backend (through
+benchmarks.stub_bedrock) as subprocesses on free ports, then at each
+concurrency level runs a batch of /analyze-stream requests for players
+nobody has looked up yet, followed by /regenerate-roasts for the recaps
+they produced. Reports throughput, p50/p95/p99 latency, time to the first
+event and the first postcard, errors and Riot calls per analysis.
+
+    cd backend && python -m benchmarks.load_test --concurrency 1,4,16 --requests 32
+
+Backend settings (ANALYSIS_MAX_CONCURRENCY, BEDROCK_DEADLINE_SECONDS, ...)
+are read from the environment as usual.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.mock_riot import DEFAULT_APP_RATE_LIMIT
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None for no values"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return round(ordered[int(rank) - 1], 3)
+
+
+def summarize(name: str, concurrency: int, samples: List[Dict], wall_seconds: float) -> Dict:
+    ok = [s for s in samples if not s.get('error')]
+    summary = {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': len(samples),
+        'errors': len(samples) - len(ok),
+        'wall_seconds': round(wall_seconds, 3),
+        'throughput_per_second': round(len(ok) / wall_seconds, 3) if wall_seconds else 0,
+    }
+    for metric in ('latency', 'first_event', 'first_postcard'):
+        values = [s[metric] for s in ok if s.get(metric) is not None]
+        if values:
+            summary[metric] = {f'p{pct}': percentile(values, pct) for pct in (50, 95, 99)}
+    error_samples = sorted({s['error'] for s in samples if s.get('error')})
+    if error_samples:
+        summary['error_samples'] = error_samples[:5]
+    return summary
+
+
+async def analyze_stream(client: httpx.AsyncClient, base_url: str, summoner_name: str) -> Dict:
+    """One /analyze-stream request, timed event by event"""
+    started = time.monotonic()
+    sample = {'first_event': None, 'first_postcard': None, 'result': None}
+    try:
+        async with client.stream('POST', f'{base_url}/analyze-stream', json={'summoner_name': summoner_name}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                sample['error'] = f'HTTP {response.status_code}'
+                return sample
+            async for line in response.aiter_lines():
+                if not line.startswith('data: '):
+                    continue
+                now = time.monotonic() - started
+                if sample['first_event'] is None:
+                    sample['first_event'] = now
+                event = json.loads(line[len('data: '):])
+                if 'postcard' in event and sample['first_postcard'] is None:
+                    sample['first_postcard'] = now
+                if 'error' in event:
+                    sample['error'] = str(event['error'])[:200]
+                if 'result' in event:
+                    sample['result'] = event['result']
+        if sample['result'] is None and not sample.get('error'):
+            sample['error'] = 'stream ended without a result'
+    except httpx.HTTPError as e:
+        sample['error'] = f'{type(e).__name__}: {e}'
+    sample['latency'] = time.monotonic() - started
+    return sample
+
+
+async def regenerate_roasts(client: httpx.AsyncClient, base_url: str, result: Dict) -> Dict:
+    started = time.monotonic()
+    sample = {}
+    try:
+        response = await client.post(f'{base_url}/regenerate-roasts', json={
+            'your_stats': result['your_stats'],
+            'your_rank': result['your_rank'],
+            'achievements': result['achievements'],
+            'used_topics': result['used_topics'],
+            'sample_truncated': result['sample_truncated'],
+        })
+        if response.status_code != 200:
+            sample['error'] = f'HTTP {response.status_code}'
+    except httpx.HTTPError as e:
+        sample['error'] = f'{type(e).__name__}: {e}'
+    sample['latency'] = time.monotonic() - started
+    return sample
+
+
+async def run_batch(concurrency: int, jobs: List) -> tuple:
+    """Run the coroutine factories in jobs, `concurrency` at a time"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(job):
+        async with semaphore:
+            return await job()
+
+    started = time.monotonic()
+    samples = await asyncio.gather(*(run(job) for job in jobs))
+    return samples, time.monotonic() - started
+
+
+async def riot_stats(client: httpx.AsyncClient, riot_url: str) -> Dict:
+    return (await client.get(f'{riot_url}/_stats')).json()
+
+
+async def run_load_test(args, backend_url: str, riot_url: str) -> List[Dict]:
+    results = []
+    next_player = 0
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2 + 10)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        for concurrency in args.concurrency:
+            # Fresh players each level, so nothing is served from an earlier level's caches
+            players = list(range(next_player, next_player + args.requests))
+            next_player += args.requests
+            if args.shared_players:
+                players = [players[i % args.shared_players] for i in range(args.requests)]
+
+            before = await riot_stats(client, riot_url)
+            samples, wall = await run_batch(concurrency, [
+                (lambda p=p: analyze_stream(client, backend_url, f'Bench{p}#NA1')) for p in players
+            ])
+            after = await riot_stats(client, riot_url)
+            summary = summarize('analyze-stream', concurrency, samples, wall)
+            completed = len(samples) - summary['errors']
+            summary['riot_requests'] = after['requests'] - before['requests']
+            summary['riot_rate_limited'] = after['rate_limited'] - before['rate_limited']
+            summary['riot_requests_per_analysis'] = (
+                round(summary['riot_requests'] / completed, 1) if completed else None)
+            results.append(summary)
+            print_row(summary)
+
+            recaps = [s['result'] for s in samples if s.get('result')]
+            if args.regenerate and recaps:
+                samples, wall = await run_batch(concurrency, [
+                    (lambda r=r: regenerate_roasts(client, backend_url, r)) for r in recaps
+                ])
+                summary = summarize('regenerate-roasts', concurrency, samples, wall)
+                results.append(summary)
+                print_row(summary)
+    return results
+
+
+def print_header():
+    print(f"{'scenario':<18} {'conc':>4} {'reqs':>5} {'errs':>5} {'req/s':>7} "
+          f"{'p50':>7} {'p95':>7} {'p99':>7} {'first p50':>10} {'card p50':>9} {'riot/req':>8}")
+
+
+def print_row(summary: Dict):
+    def fmt(value):
+        return '-' if value is None else f'{value:.2f}'
+    latency = summary.get('latency', {})
+    print(f"{summary['scenario']:<18} {summary['concurrency']:>4} {summary['requests']:>5} {summary['errors']:>5} "
+          f"{summary['throughput_per_second']:>7.2f} {fmt(latency.get('p50')):>7} {fmt(latency.get('p95')):>7} "
+          f"{fmt(latency.get('p99')):>7} {fmt(summary.get('first_event', {}).get('p50')):>10} "
+          f"{fmt(summary.get('first_postcard', {}).get('p50')):>9} "
+          f"{fmt(summary.get('riot_requests_per_analysis')):>8}")
+    for error in summary.get('error_samples', []):
+        print(f"    error: {error}")
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} didn't come up within {timeout}s")
+
+
+def start_servers(args) -> tuple:
+    """Start the mock Riot API and the backend; returns (processes, backend_url, riot_url)"""
+    riot_port, backend_port = free_port(), free_port()
+    riot_url, backend_url = f'http://127.0.0.1:{riot_port}', f'http://127.0.0.1:{backend_port}'
+    processes = []
+
+    riot = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.mock_riot', '--port', str(riot_port),
+        '--matches-per-player', str(args.matches_per_player),
+        '--latency-ms', str(args.riot_latency_ms), '--jitter-ms', str(args.riot_jitter_ms),
+        '--app-rate-limit', args.app_rate_limit, '--throttle-rate', str(args.throttle_rate),
+    ], cwd=BACKEND_DIR)
+    processes.append(riot)
+    wait_until_up(f'{riot_url}/_stats', riot)
+
+    env = dict(os.environ)
+    env.update({
+        'RIOT_API_HOST_TEMPLATE': riot_url,
+        # The backend paces itself to the limit the mock enforces
+        'RIOT_APP_RATE_LIMIT': args.app_rate_limit or '1000000:1',
+        'MATCH_STORE_PATH': '',
+        'PLAYER_STORE_PATH': '',
+    })
+    backend = subprocess.Popen([
+        sys.executable, '-m', 'benchmarks.stub_bedrock', '--port', str(backend_port),
+        '--seconds', str(args.bedrock_seconds), '--first-postcard-seconds', str(args.first_postcard_seconds),
+    ], cwd=BACKEND_DIR, env=env, stdout=None if args.verbose else subprocess.DEVNULL)
+    processes.append(backend)
+    wait_until_up(f'{backend_url}/health', backend)
+    return processes, backend_url, riot_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--concurrency', default='1,4,16',
+                        type=lambda value: [int(c) for c in value.split(',')], help='comma-separated levels')
+    parser.add_argument('--requests', type=int, default=16, help='analyses per concurrency level')
+    parser.add_argument('--shared-players', type=int, default=0,
+                        help='spread the requests over this many players (0: a new player each)')
+    parser.add_argument('--no-regenerate', dest='regenerate', action='store_false',
+                        help='skip the /regenerate-roasts scenario')
+    parser.add_argument('--matches-per-player', type=int, default=100)
+    parser.add_argument('--riot-latency-ms', type=float, default=30)
+    parser.add_argument('--riot-jitter-ms', type=float, default=10)
+    parser.add_argument('--app-rate-limit', default=DEFAULT_APP_RATE_LIMIT,
+                        help='limit the mock enforces (and the backend is told about)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of Riot calls answered 429 at random')
+    parser.add_argument('--bedrock-seconds', type=float, default=4.0)
+    parser.add_argument('--first-postcard-seconds', type=float, default=1.0)
+    parser.add_argument('--timeout', type=float, default=300, help='per-request timeout in seconds')
+    parser.add_argument('--output', help='also write the results to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="show the backend's output")
+    args = parser.parse_args()
+
+    processes, backend_url, riot_url = start_servers(args)
+    try:
+        print_header()
+        results = asyncio.run(run_load_test(args, backend_url, riot_url))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'config': {k: v for k, v in vars(args).items() if k != 'output'}, 'results': results}, f,
+                      indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Local stand-in for the Riot API endpoints the backend calls.
+
+Serves account-v1, summoner-v4, league-v4 and match-v5 for synthetic
+players named Bench<n>#NA1 (n below --players), with configurable latency,
+an enforced app rate limit (429 + Retry-After once it's used up, like
+Riot) and optional random 429s. Point the backend at it with
+RIOT_API_HOST_TEMPLATE=http://127.0.0.1:<port>; every routing value lands
+on the same server.
+
+    python -m benchmarks.mock_riot --port 8089 --latency-ms 40
+
+GET /_stats returns request counts by endpoint and status.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request, Response
+
+from benchmarks.synthetic import FIRST_GAME_ID, game_creation_ms, make_match, puuid_for
+
+TIERS = ['IRON', 'BRONZE', 'SILVER', 'GOLD', 'PLATINUM', 'EMERALD', 'DIAMOND']
+DIVISIONS = ['I', 'II', 'III', 'IV']
+
+# Production key limits
+DEFAULT_APP_RATE_LIMIT = "500:10,30000:600"
+
+
+class MockRiotConfig:
+    def __init__(self, players: int = 10000, matches_per_player: int = 100, latency_ms: float = 30,
+                 jitter_ms: float = 10, app_rate_limit: str = DEFAULT_APP_RATE_LIMIT, throttle_rate: float = 0.0,
+                 retry_after: int = 1, seed: int = 0):
+        self.players = players
+        self.matches_per_player = matches_per_player
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.app_rate_limit = app_rate_limit
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.seed = seed
+
+
+class FixedWindows:
+    """Riot-style fixed windows: each starts on its first request and resets when it expires"""
+
+    def __init__(self, spec: str):
+        self.windows = []
+        for part in filter(None, spec.split(',')):
+            count, seconds = part.split(':')
+            self.windows.append({'limit': int(count), 'seconds': int(seconds), 'count': 0, 'reset_at': None})
+
+    def acquire(self) -> Optional[int]:
+        """Count a request; returns seconds to wait instead if a window is full"""
+        now = time.monotonic()
+        for window in self.windows:
+            if window['reset_at'] is not None and now >= window['reset_at']:
+                window['count'], window['reset_at'] = 0, None
+        full = [w for w in self.windows if w['count'] >= w['limit']]
+        if full:
+            return max(1, int(max(w['reset_at'] - now for w in full) + 0.999))
+        for window in self.windows:
+            if window['reset_at'] is None:
+                window['reset_at'] = now + window['seconds']
+            window['count'] += 1
+        return None
+
+    def count_header(self) -> str:
+        return ','.join(f"{w['count']}:{w['seconds']}" for w in self.windows)
+
+
+def create_app(config: MockRiotConfig) -> FastAPI:
+    app = FastAPI(title="Mock Riot API")
+    rng = random.Random(config.seed)
+    windows = FixedWindows(config.app_rate_limit)
+    stats: Counter = Counter()
+
+    def player_number(puuid: str) -> Optional[int]:
+        match = re.match(r'^bench-(\d{6})-', puuid)
+        if not match or int(match.group(1)) >= config.players:
+            return None
+        return int(match.group(1))
+
+    def match_ids_for(player: int) -> List[int]:
+        """Game IDs for a player, newest first; interleaved so everyone plays all season"""
+        return [FIRST_GAME_ID + game * config.players + player
+                for game in reversed(range(config.matches_per_player))]
+
+    @lru_cache(maxsize=20000)
+    def match_body(game_id: int) -> bytes:
+        owner = (game_id - FIRST_GAME_ID) % config.players
+        return json.dumps(make_match(game_id, [puuid_for(owner)], seed=config.seed), separators=(',', ':')).encode()
+
+    @app.middleware("http")
+    async def riot_behaviour(request: Request, call_next):
+        if request.url.path.startswith('/_'):
+            return await call_next(request)
+
+        endpoint = re.sub(r'/(bench-[^/]+|NA1_\d+|Bench\d+/[^/]+)', '/{id}', request.url.path)
+        delay = max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        await asyncio.sleep(delay)
+
+        wait = windows.acquire()
+        if wait is None and config.throttle_rate and rng.random() < config.throttle_rate:
+            wait = config.retry_after
+        if wait is not None:
+            stats[(endpoint, 429)] += 1
+            return Response(status_code=429, headers={
+                'Retry-After': str(wait),
+                'X-Rate-Limit-Type': 'application',
+                'X-App-Rate-Limit': config.app_rate_limit,
+                'X-App-Rate-Limit-Count': windows.count_header(),
+            })
+
+        response = await call_next(request)
+        stats[(endpoint, response.status_code)] += 1
+        response.headers['X-App-Rate-Limit'] = config.app_rate_limit
+        response.headers['X-App-Rate-Limit-Count'] = windows.count_header()
+        return response
+
+    @app.get("/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}")
+    async def account(game_name: str, tag_line: str):
+        match = re.match(r'^bench(\d+)$', game_name, re.IGNORECASE)
+        if not match or int(match.group(1)) >= config.players:
+            return Response(status_code=404)
+        return {'puuid': puuid_for(int(match.group(1))), 'gameName': game_name, 'tagLine': tag_line}
+
+    @app.get("/lol/summoner/v4/summoners/by-puuid/{puuid}")
+    async def summoner(puuid: str):
+        if player_number(puuid) is None:
+            return Response(status_code=404)
+        # No 'id', like the live API since the summoner ID deprecation
+        return {'puuid': puuid, 'profileIconId': 29, 'revisionDate': 1735776000000, 'summonerLevel': 250}
+
+    @app.get("/lol/league/v4/entries/by-puuid/{puuid}")
+    async def league_entries(puuid: str):
+        player = player_number(puuid)
+        if player is None:
+            return []
+        return [{
+            'queueType': 'RANKED_SOLO_5x5',
+            'tier': TIERS[player % len(TIERS)],
+            'rank': DIVISIONS[player % len(DIVISIONS)],
+            'leaguePoints': player % 100,
+            'wins': config.matches_per_player // 2,
+            'losses': config.matches_per_player - config.matches_per_player // 2,
+            'puuid': puuid,
+        }]
+
+    @app.get("/lol/match/v5/matches/by-puuid/{puuid}/ids")
+    async def match_ids(puuid: str, start: int = 0, count: int = 20, startTime: Optional[int] = None,
+                        queue: Optional[int] = None):
+        player = player_number(puuid)
+        if player is None:
+            return []
+        ids = match_ids_for(player)
+        if startTime is not None:
+            ids = [game_id for game_id in ids if game_creation_ms(game_id) // 1000 >= startTime]
+        return [f"NA1_{game_id}" for game_id in ids[start:start + count]]
+
+    @app.get("/lol/match/v5/matches/{match_id}")
+    async def match(match_id: str):
+        found = re.match(r'^NA1_(\d+)$', match_id)
+        if not found or int(found.group(1)) < FIRST_GAME_ID:
+            return Response(status_code=404)
+        return Response(content=match_body(int(found.group(1))), media_type='application/json')
+
+    @app.get("/_stats")
+    async def request_stats():
+        by_endpoint: Dict[str, Dict[str, int]] = {}
+        for (endpoint, status), count in stats.items():
+            by_endpoint.setdefault(endpoint, {})[str(status)] = count
+        return {
+            'requests': sum(stats.values()),
+            'rate_limited': sum(count for (_, status), count in stats.items() if status == 429),
+            'endpoints': by_endpoint
+        }
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--players', type=int, default=10000)
+    parser.add_argument('--matches-per-player', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=30, help='mean response latency')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='standard deviation of the latency')
+    parser.add_argument('--app-rate-limit', default=DEFAULT_APP_RATE_LIMIT,
+                        help='enforced limit, e.g. "500:10,30000:600" (empty for none)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered 429 at random')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After for the random 429s')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = MockRiotConfig(args.players, args.matches_per_player, args.latency_ms, args.jitter_ms,
+                            args.app_rate_limit, args.throttle_rate, args.retry_after, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
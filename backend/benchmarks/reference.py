@@ -0,0 +1,97 @@
+"""calculate_player_stats as it was before the analysis engine was optimized.
+
+analysis_bench checks the optimized paths against this. Don't update it to
+track analysis.py - it's what "same output" means there.
+"""
+from typing import Dict, List
+
+
+def calculate_player_stats(matches: List[Dict], puuid: str) -> Dict:
+    """Calculate aggregate stats for a player"""
+    stats = {
+        'total_games': 0,
+        'wins': 0,
+        'kills': [],
+        'deaths': [],
+        'assists': [],
+        'cs': [],
+        'game_durations': [],
+        'vision_scores': [],
+        'damage_share': [],
+        'win_streaks': [],
+        'loss_streaks': [],
+        'champions': {}
+    }
+
+    current_win_streak = 0
+    current_loss_streak = 0
+
+    for match in matches:
+        if not match or 'info' not in match:
+            continue
+
+        # Find this player in the match
+        player_data = None
+        for p in match['info']['participants']:
+            if p.get('puuid') == puuid:
+                player_data = p
+                break
+
+        if not player_data:
+            continue
+
+        stats['total_games'] += 1
+
+        # Win/Loss tracking
+        if player_data.get('win'):
+            stats['wins'] += 1
+            current_win_streak += 1
+            if current_loss_streak > 0:
+                stats['loss_streaks'].append(current_loss_streak)
+                current_loss_streak = 0
+        else:
+            current_loss_streak += 1
+            if current_win_streak > 0:
+                stats['win_streaks'].append(current_win_streak)
+                current_win_streak = 0
+
+        # KDA stats
+        stats['kills'].append(player_data.get('kills', 0))
+        stats['deaths'].append(player_data.get('deaths', 0))
+        stats['assists'].append(player_data.get('assists', 0))
+
+        # CS stats
+        total_cs = player_data.get('totalMinionsKilled', 0) + player_data.get('neutralMinionsKilled', 0)
+        game_duration_min = match['info'].get('gameDuration', 0) / 60
+        if game_duration_min > 0:
+            stats['cs'].append(total_cs / game_duration_min)
+            stats['game_durations'].append(game_duration_min)
+
+        # Vision
+        stats['vision_scores'].append(player_data.get('visionScore', 0))
+
+        # Damage share
+        team_id = player_data.get('teamId')
+        team_damage = sum(p.get('totalDamageDealtToChampions', 0)
+                         for p in match['info']['participants']
+                         if p.get('teamId') == team_id)
+        player_damage = player_data.get('totalDamageDealtToChampions', 0)
+
+        if team_damage > 0:
+            stats['damage_share'].append((player_damage / team_damage) * 100)
+
+        # Champion tracking
+        champ = player_data.get('championName', 'Unknown')
+        if champ not in stats['champions']:
+            stats['champions'][champ] = {'games': 0, 'wins': 0}
+        stats['champions'][champ]['games'] += 1
+        if player_data.get('win'):
+            stats['champions'][champ]['wins'] += 1
+
+    # Add final streaks
+    if current_win_streak > 0:
+        stats['win_streaks'].append(current_win_streak)
+    if current_loss_streak > 0:
+        stats['loss_streaks'].append(current_loss_streak)
+
+    return stats
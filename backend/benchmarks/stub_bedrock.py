@@ -0,0 +1,93 @@
+"""Runs the backend with Bedrock replaced by a stub, for load tests.
+
+The stub answers like the model would (the same JSON, streamed in chunks
+for the streaming call) after a configurable delay, so everything around
+the model call - invoker, hedging, caches, SSE - runs for real without
+AWS credentials or spend.
+
+    python -m benchmarks.stub_bedrock --port 8000 --seconds 4
+
+Riot calls go wherever RIOT_API_HOST_TEMPLATE points (see mock_riot).
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from bedrock_client import parse_postcards_response
+
+
+def stub_response(prompt: str, postcards: int = 6) -> str:
+    """Model-shaped JSON for a prompt; the same prompt gets the same postcards"""
+    digest = hashlib.sha256(prompt.encode()).hexdigest()
+    cards = [{
+        'type': 'roast' if i else 'stats',
+        'title': f"Stub postcard {i + 1}",
+        'content': f"Synthetic roast {digest[i * 4:i * 4 + 8]} standing in for the model's.",
+    } for i in range(postcards)]
+    return json.dumps({'postcards': cards, 'topics': [f"topic-{digest[:6]}-{i}" for i in range(3)]})
+
+
+def install(bedrock_client, seconds: float = 4.0, first_postcard_seconds: float = 1.0, jitter: float = 0.2,
+            postcards: int = 6) -> None:
+    """Swap bedrock_client's model calls for the stub.
+
+    A call takes about `seconds` (give or take `jitter`, as a fraction);
+    streamed calls send their first postcard after first_postcard_seconds
+    and spread the rest over the remaining time. The calls block their
+    invoker worker thread the way the real ones do.
+    """
+    def delay() -> float:
+        return seconds * random.uniform(1 - jitter, 1 + jitter)
+
+    def invoke(prompt: str) -> Tuple[List[Dict], List[str]]:
+        time.sleep(delay())
+        return parse_postcards_response(stub_response(prompt, postcards))
+
+    def invoke_stream(prompt: str) -> Iterator[str]:
+        total = delay()
+        text = stub_response(prompt, postcards)
+        # One chunk per postcard, cut where the next one starts
+        cuts = [match.start() for match in re.finditer(r'\{"type"', text)][1:]
+        chunks = [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+        time.sleep(min(first_postcard_seconds, total))
+        rest = max(0.0, total - first_postcard_seconds) / max(len(chunks) - 1, 1)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(rest)
+            yield chunk
+
+    bedrock_client._invoke = invoke
+    bedrock_client._invoke_stream = invoke_stream
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--seconds', type=float, default=4.0, help='mean model call time')
+    parser.add_argument('--first-postcard-seconds', type=float, default=1.0,
+                        help='time to the first streamed postcard')
+    parser.add_argument('--postcards', type=int, default=6)
+    args = parser.parse_args()
+
+    # Nothing on disk and no real AWS, unless the caller says otherwise
+    os.environ.setdefault('MATCH_STORE_PATH', '')
+    os.environ.setdefault('PLAYER_STORE_PATH', '')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'stub')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'stub')
+    os.environ.setdefault('RIOT_API_KEY', 'stub')
+
+    import uvicorn
+    import main as backend
+
+    install(backend.bedrock_client, args.seconds, args.first_postcard_seconds, postcards=args.postcards)
+    uvicorn.run(backend.app, host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == "__main__":
+    main()
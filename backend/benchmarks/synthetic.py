@@ -0,0 +1,127 @@
+"""Synthetic match-v5 data for the benchmarks.
+
+Everything is derived from a seed, so the same arguments always give the
+same matches, byte for byte.
+"""
+import random
+from typing import Dict, Iterator, List
+
+CHAMPIONS = ['Ahri', 'Yasuo', 'Lux', 'Jinx', 'Thresh', 'LeeSin', 'Garen', 'Ezreal', 'Leona', 'Zed',
+             'Caitlyn', 'Darius', 'Morgana', 'Vayne', 'Nautilus', 'Sylas', 'Viego', 'KaiSa', 'Sett', 'Lulu']
+POSITIONS = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'UTILITY']
+
+# Game IDs count up from here; newer games get higher IDs, like Riot's
+FIRST_GAME_ID = 5_000_000_000
+# 2025-01-02 UTC in milliseconds - 2025 in every time zone
+SEASON_START_MS = 1_735_776_000_000
+
+
+def puuid_for(player: int) -> str:
+    """A PUUID-shaped ID for synthetic player number `player`"""
+    return f"bench-{player:06d}-" + 'x' * 63
+
+
+def game_creation_ms(game_id: int) -> int:
+    """Games start ten seconds apart (a million of them still fit in one season)"""
+    return SEASON_START_MS + (game_id - FIRST_GAME_ID) * 10_000
+
+
+def make_participant(rng: random.Random, puuid: str, team_id: int, position: str, win: bool,
+                     full: bool = False) -> Dict:
+    kills = rng.randint(0, 15)
+    deaths = rng.randint(0, 12)
+    assists = rng.randint(0, 20)
+    participant = {
+        'puuid': puuid,
+        'summonerId': 'summoner-' + puuid[:20],
+        'riotIdGameName': 'Bench',
+        'riotIdTagline': 'NA1',
+        'teamId': team_id,
+        'teamPosition': position,
+        'win': win,
+        'championName': rng.choice(CHAMPIONS),
+        'champLevel': rng.randint(10, 18),
+        'kills': kills,
+        'deaths': deaths,
+        'assists': assists,
+        'totalMinionsKilled': rng.randint(20, 280),
+        'neutralMinionsKilled': rng.randint(0, 60),
+        'visionScore': rng.randint(5, 80),
+        'totalDamageDealtToChampions': rng.randint(4000, 45000),
+        'goldEarned': rng.randint(6000, 18000),
+        'item0': rng.randint(1000, 7000),
+        'item1': rng.randint(1000, 7000),
+        'item2': rng.randint(1000, 7000),
+        'challenges': {
+            'kda': round((kills + assists) / max(deaths, 1), 2),
+            'killParticipation': round(rng.random(), 3),
+            'damagePerMinute': round(rng.uniform(300, 1500), 1),
+            'goldPerMinute': round(rng.uniform(250, 550), 1),
+        },
+        'perks': {'styles': [{'style': 8100, 'selections': [{'perk': 8112}, {'perk': 8139}]}]},
+    }
+    if full:
+        # A real participant has ~150 fields and ~120 challenges, keys in alphabetical order
+        participant.update({f'statField{k:03d}': rng.randint(0, 50000) for k in range(120)})
+        participant['challenges'].update({f'challenge{k:03d}': round(rng.uniform(0, 100), 4) for k in range(120)})
+        participant['missions'] = {f'playerScore{k}': rng.randint(0, 10) for k in range(12)}
+        participant = dict(sorted(participant.items()))
+    return participant
+
+
+def make_match(game_id: int, puuids: List[str], queue_id: int = 420, seed: int = 0, full: bool = False) -> Dict:
+    """A match-v5 payload for game `game_id` with these (up to 10) players in it.
+
+    Slots not taken by puuids get filler players. The first five are team
+    100, the rest team 200. full=True pads every participant with filler
+    fields to the size of a real payload (~60KB), for parsing benchmarks.
+    """
+    rng = random.Random(game_id * 1_000_003 + seed)
+    players = list(puuids[:10])
+    players += [f"filler-{game_id}-{slot}" for slot in range(len(players), 10)]
+    blue_wins = rng.random() < 0.5
+    participants = [
+        make_participant(rng, puuid, 100 if slot < 5 else 200, POSITIONS[slot % 5], (slot < 5) == blue_wins, full)
+        for slot, puuid in enumerate(players)
+    ]
+    match_id = f"NA1_{game_id}"
+    return {
+        'metadata': {'dataVersion': '2', 'matchId': match_id, 'participants': players},
+        'info': {
+            'gameCreation': game_creation_ms(game_id),
+            'gameDuration': rng.randint(900, 2700),
+            'gameMode': 'CLASSIC',
+            'gameVersion': '15.1.1',
+            'mapId': 11,
+            'queueId': queue_id,
+            'participants': participants,
+            'teams': [{'teamId': 100, 'win': blue_wins}, {'teamId': 200, 'win': not blue_wins}],
+        },
+    }
+
+
+def iter_corpus(matches: int, players: int, seed: int = 0, full: bool = False) -> Iterator[Dict]:
+    """`matches` games among `players` players, oldest first, one at a time.
+
+    Each game takes up to 10 players from a shuffled rotation, so everyone
+    is in about matches * 10 / players of them (all of them with fewer
+    than 10 players).
+    """
+    rng = random.Random(seed)
+    pool = [puuid_for(p) for p in range(players)]
+    rotation: List[str] = []
+    lobby_size = min(10, players)
+    for n in range(matches):
+        if len(rotation) < lobby_size:
+            refill = pool[:]
+            rng.shuffle(refill)
+            leftover = set(rotation)
+            rotation += [p for p in refill if p not in leftover]
+            rotation.reverse()
+        # Taken from the end, so each lobby is a cheap pop
+        lobby = [rotation.pop() for _ in range(lobby_size)]
+        yield make_match(FIRST_GAME_ID + n, lobby, seed=seed, full=full)
+
+
+def make_corpus(matches: int, players: int, seed: int = 0) -> List[Dict]:
+    return list(iter_corpus(matches, players, seed))
@@ -0,0 +1,138 @@
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def approximate_size(value: Any) -> int:
+    """Rough in-memory footprint of a JSON-like value, in bytes"""
+    try:
+        return len(json.dumps(value, separators=(',', ':'), default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Thread-safe in-memory cache with a TTL and least-recently-used eviction.
+
+    Entries expire ttl_seconds after they were set (or after the ttl given
+    to set). Once max_entries is reached, or max_bytes if set, the least
+    recently read entries make room for the new one; sizes come from
+    sizeof, an estimate that only needs to be roughly right.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = approximate_size):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the value for key, or None if it's missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl is None else ttl)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self._bytes -= previous[2]
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                    self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1):
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry:
+                self._bytes -= entry[2]
+        return entry[0] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'bytes': self._bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+
+class LookupCache:
+    """Cache for Riot lookups, with a TTL per endpoint and one memory cap.
+
+    Keys are namespaced by endpoint ('account', 'summoner', 'rank', ...),
+    so a Riot ID -> PUUID mapping can live for a day while ranks go stale
+    in minutes, and all of them share one LRU order and byte budget.
+    Endpoints without a TTL aren't cached.
+    """
+
+    def __init__(self, ttls: Dict[str, float], max_entries: int = 50000, max_bytes: int = 32 * 1024 * 1024):
+        self.ttls = ttls
+        self._cache = TTLCache(max_entries=max_entries, ttl_seconds=max(ttls.values(), default=0),
+                               max_bytes=max_bytes)
+        self._hits = {endpoint: 0 for endpoint in ttls}
+        self._misses = {endpoint: 0 for endpoint in ttls}
+
+    def get(self, endpoint: str, key: Hashable) -> Optional[Any]:
+        if not self.ttls.get(endpoint):
+            return None
+        value = self._cache.get((endpoint, key))
+        if value is None:
+            self._misses[endpoint] += 1
+        else:
+            self._hits[endpoint] += 1
+        return value
+
+    def set(self, endpoint: str, key: Hashable, value: Any) -> None:
+        ttl = self.ttls.get(endpoint)
+        if ttl and value is not None:
+            self._cache.set((endpoint, key), value, ttl=ttl)
+
+    def stats(self) -> Dict:
+        endpoints = {}
+        for endpoint in self.ttls:
+            lookups = self._hits[endpoint] + self._misses[endpoint]
+            endpoints[endpoint] = {
+                'hits': self._hits[endpoint],
+                'misses': self._misses[endpoint],
+                'hit_rate': round(self._hits[endpoint] / lookups, 3) if lookups else 0
+            }
+        return {**self._cache.stats(), 'endpoints': endpoints}
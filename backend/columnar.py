@@ -0,0 +1,291 @@
+"""Columnar, NumPy-backed version of calculate_player_stats + aggregate_stats.
+
+Loads a batch of matches for any number of players into flat arrays once,
+then computes every per-player aggregate, streak and damage share with
+vectorized operations. Meant for offline recomputation over many players;
+the outputs are in the same dict shapes as the functions in analysis.py.
+NumPy comes from requirements-bench.txt; the served app doesn't import this.
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from match_record import MatchRecord
+
+
+class MatchColumns:
+    """Per-player match rows for a batch of players, stored as arrays.
+
+    Rows are grouped by player and, within a player, kept in the order the
+    matches were given (newest first, like everywhere else), which the
+    streak logic depends on.
+    """
+
+    def __init__(self, puuids: List[str], player: np.ndarray, win: np.ndarray, kills: np.ndarray,
+                 deaths: np.ndarray, assists: np.ndarray, cs_total: np.ndarray, duration: np.ndarray,
+                 vision: np.ndarray, damage: np.ndarray, team_damage: np.ndarray, champion: np.ndarray,
+                 champion_names: List[str]):
+        order = np.argsort(player, kind='stable')
+        self.puuids = puuids
+        self.player = player[order]
+        self.win = win[order]
+        self.kills = kills[order]
+        self.deaths = deaths[order]
+        self.assists = assists[order]
+        self.cs_total = cs_total[order]
+        self.duration = duration[order]
+        self.vision = vision[order]
+        self.damage = damage[order]
+        self.team_damage = team_damage[order]
+        self.champion = champion[order]
+        self.champion_names = champion_names
+
+    @classmethod
+    def from_matches(cls, matches: List[Dict], puuids: List[str]) -> 'MatchColumns':
+        """Load raw match-v5 dicts for the given players.
+
+        Every participant's damage goes into one array so the per-team totals
+        come out of a single bincount instead of a rescan per player.
+        """
+        player_index = {puuid: i for i, puuid in enumerate(puuids)}
+        champion_codes = {}
+        rows = {key: [] for key in ('player', 'match', 'team', 'win', 'kills', 'deaths', 'assists', 'cs_total',
+                                    'duration', 'vision', 'damage', 'champion')}
+        all_match, all_team, all_damage = [], [], []
+
+        for match_idx, match in enumerate(matches):
+            if not match or 'info' not in match:
+                continue
+            info = match['info']
+            duration = info.get('gameDuration', 0)
+            for p in info['participants']:
+                team = p.get('teamId')
+                team = -1 if team is None else team
+                damage = p.get('totalDamageDealtToChampions', 0)
+                all_match.append(match_idx)
+                all_team.append(team)
+                all_damage.append(damage)
+
+                idx = player_index.get(p.get('puuid'))
+                if idx is None:
+                    continue
+                champion = p.get('championName', 'Unknown')
+                rows['player'].append(idx)
+                rows['match'].append(match_idx)
+                rows['team'].append(team)
+                rows['win'].append(bool(p.get('win')))
+                rows['kills'].append(p.get('kills', 0))
+                rows['deaths'].append(p.get('deaths', 0))
+                rows['assists'].append(p.get('assists', 0))
+                rows['cs_total'].append(p.get('totalMinionsKilled', 0) + p.get('neutralMinionsKilled', 0))
+                rows['duration'].append(duration)
+                rows['vision'].append(p.get('visionScore', 0))
+                rows['damage'].append(damage)
+                rows['champion'].append(champion_codes.setdefault(champion, len(champion_codes)))
+
+        # Team damage totals keyed by (match, team)
+        all_match = np.asarray(all_match, dtype=np.int64)
+        all_team = np.asarray(all_team, dtype=np.int64)
+        teams, team_key = np.unique(all_team, return_inverse=True)
+        team_totals = np.bincount(all_match * len(teams) + team_key,
+                                  weights=np.asarray(all_damage, dtype=np.float64),
+                                  minlength=len(matches) * max(len(teams), 1))
+        row_team_key = np.searchsorted(teams, np.asarray(rows['team'], dtype=np.int64))
+        team_damage = team_totals[np.asarray(rows['match'], dtype=np.int64) * len(teams) + row_team_key] \
+            if rows['match'] else np.zeros(0)
+
+        return cls(
+            puuids,
+            player=np.asarray(rows['player'], dtype=np.int64),
+            win=np.asarray(rows['win'], dtype=bool),
+            kills=np.asarray(rows['kills'], dtype=np.int64),
+            deaths=np.asarray(rows['deaths'], dtype=np.int64),
+            assists=np.asarray(rows['assists'], dtype=np.int64),
+            cs_total=np.asarray(rows['cs_total'], dtype=np.int64),
+            duration=np.asarray(rows['duration'], dtype=np.int64),
+            vision=np.asarray(rows['vision'], dtype=np.int64),
+            damage=np.asarray(rows['damage'], dtype=np.int64),
+            team_damage=np.asarray(team_damage, dtype=np.int64),
+            champion=np.asarray(rows['champion'], dtype=np.int64),
+            champion_names=list(champion_codes),
+        )
+
+    @classmethod
+    def from_records(cls, records_by_puuid: Dict[str, List[MatchRecord]]) -> 'MatchColumns':
+        """Load MatchRecords, which already carry their team's damage total"""
+        puuids = list(records_by_puuid)
+        champion_codes = {}
+        records = [(i, r) for i, puuid in enumerate(puuids) for r in records_by_puuid[puuid] if r]
+
+        def column(getter, dtype=np.int64):
+            return np.fromiter((getter(r) for _, r in records), dtype=dtype, count=len(records))
+
+        return cls(
+            puuids,
+            player=np.fromiter((i for i, _ in records), dtype=np.int64, count=len(records)),
+            win=column(lambda r: r.win, bool),
+            kills=column(lambda r: r.kills),
+            deaths=column(lambda r: r.deaths),
+            assists=column(lambda r: r.assists),
+            cs_total=column(lambda r: r.total_minions_killed + r.neutral_minions_killed),
+            duration=column(lambda r: r.game_duration),
+            vision=column(lambda r: r.vision_score),
+            damage=column(lambda r: r.damage_to_champions),
+            team_damage=column(lambda r: r.team_damage),
+            champion=column(lambda r: champion_codes.setdefault(r.champion_name, len(champion_codes))),
+            champion_names=list(champion_codes),
+        )
+
+    def _split(self, values: np.ndarray, owners: np.ndarray) -> List[list]:
+        """Split values (grouped by owner) into one Python list per player"""
+        counts = np.bincount(owners, minlength=len(self.puuids))
+        return [part.tolist() for part in np.split(values, np.cumsum(counts)[:-1])]
+
+    def _runs(self):
+        """Run-length encode wins per player: (lengths, won, owner) per streak"""
+        n = len(self.player)
+        if n == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int64)
+
+        new_run = np.empty(n, dtype=bool)
+        new_run[0] = True
+        new_run[1:] = (self.win[1:] != self.win[:-1]) | (self.player[1:] != self.player[:-1])
+        run_starts = np.flatnonzero(new_run)
+        return np.diff(np.append(run_starts, n)), self.win[run_starts], self.player[run_starts]
+
+    def _champions(self):
+        """Per-player champion (games, wins), ordered by first appearance"""
+        n_champs = max(len(self.champion_names), 1)
+        keys, first_index, inverse, games = np.unique(
+            self.player * n_champs + self.champion, return_index=True, return_inverse=True, return_counts=True)
+        wins = np.bincount(inverse, weights=self.win, minlength=len(keys)).astype(np.int64)
+        owner = keys // n_champs
+        champ = keys % n_champs
+
+        # np.unique sorts by code; dicts in analysis.py keep first-seen order
+        order = np.lexsort((first_index, owner))
+        return owner[order], champ[order], games[order], wins[order]
+
+    def raw_stats(self) -> Dict[str, Dict]:
+        """Raw stats per PUUID, in the shape calculate_player_stats returns"""
+        n_players = len(self.puuids)
+        total_games = np.bincount(self.player, minlength=n_players)
+        wins = np.bincount(self.player[self.win], minlength=n_players)
+
+        timed = self.duration > 0
+        duration_min = self.duration[timed] / 60
+        cs = self.cs_total[timed] / duration_min
+        damaged = self.team_damage > 0
+        damage_share = (self.damage[damaged] / self.team_damage[damaged]) * 100
+
+        kills = self._split(self.kills, self.player)
+        deaths = self._split(self.deaths, self.player)
+        assists = self._split(self.assists, self.player)
+        vision = self._split(self.vision, self.player)
+        cs_lists = self._split(cs, self.player[timed])
+        durations = self._split(duration_min, self.player[timed])
+        shares = self._split(damage_share, self.player[damaged])
+        # Streaks come out in the order they happened, which is the order
+        # calculate_player_stats appends them in (trailing streak last)
+        run_lengths, run_win, run_player = self._runs()
+        win_streaks = self._split(run_lengths[run_win], run_player[run_win])
+        loss_streaks = self._split(run_lengths[~run_win], run_player[~run_win])
+
+        champions = [{} for _ in self.puuids]
+        for owner, champ, games, champ_wins in zip(*(a.tolist() for a in self._champions())):
+            champions[owner][self.champion_names[champ]] = {'games': games, 'wins': champ_wins}
+
+        return {
+            puuid: {
+                'total_games': int(total_games[i]),
+                'wins': int(wins[i]),
+                'kills': kills[i],
+                'deaths': deaths[i],
+                'assists': assists[i],
+                'cs': cs_lists[i],
+                'game_durations': durations[i],
+                'vision_scores': vision[i],
+                'damage_share': shares[i],
+                'win_streaks': win_streaks[i],
+                'loss_streaks': loss_streaks[i],
+                'champions': champions[i]
+            }
+            for i, puuid in enumerate(self.puuids)
+        }
+
+    def aggregate_stats(self) -> Dict[str, Dict]:
+        """Aggregated stats per PUUID, in the shape aggregate_stats returns"""
+        n_players = len(self.puuids)
+
+        def grouped_mean(values, owners):
+            counts = np.bincount(owners, minlength=n_players)
+            sums = np.bincount(owners, weights=values, minlength=n_players)
+            return np.divide(sums, counts, out=np.zeros(n_players), where=counts > 0).tolist()
+
+        def grouped_max(values, owners):
+            result = np.zeros(n_players, dtype=np.int64)
+            np.maximum.at(result, owners, values)
+            return result.tolist()
+
+        total_games = np.bincount(self.player, minlength=n_players)
+        wins = np.bincount(self.player[self.win], minlength=n_players)
+        # Same operation order as aggregate_stats: wins / games * 100
+        win_rate = np.where(total_games > 0, wins / np.maximum(total_games, 1) * 100, 0).tolist()
+
+        avg_kills = np.asarray(grouped_mean(self.kills, self.player))
+        avg_deaths = np.asarray(grouped_mean(self.deaths, self.player))
+        avg_assists = np.asarray(grouped_mean(self.assists, self.player))
+        kda = np.where(avg_deaths > 0, (avg_kills + avg_assists) / np.where(avg_deaths > 0, avg_deaths, 1),
+                       avg_kills + avg_assists).tolist()
+
+        timed = self.duration > 0
+        cs_per_min = grouped_mean(self.cs_total[timed] / (self.duration[timed] / 60), self.player[timed])
+        avg_vision = grouped_mean(self.vision, self.player)
+        damaged = self.team_damage > 0
+        avg_share = grouped_mean((self.damage[damaged] / self.team_damage[damaged]) * 100, self.player[damaged])
+
+        run_lengths, run_win, run_player = self._runs()
+        avg_win_streak = grouped_mean(run_lengths[run_win], run_player[run_win])
+        max_win_streak = grouped_max(run_lengths[run_win], run_player[run_win])
+        avg_loss_streak = grouped_mean(run_lengths[~run_win], run_player[~run_win])
+        max_loss_streak = grouped_max(run_lengths[~run_win], run_player[~run_win])
+        has_win_streak = np.bincount(run_player[run_win], minlength=n_players) > 0
+        has_loss_streak = np.bincount(run_player[~run_win], minlength=n_players) > 0
+
+        # Champion pool: Herfindahl diversity and top 3 by games
+        owner, champ, games, champ_wins = self._champions()
+        shares = games / np.maximum(total_games[owner], 1)
+        diversity = np.where(total_games > 0,
+                             1 - np.bincount(owner, weights=shares * shares, minlength=n_players), 0).tolist()
+        top_order = np.lexsort((np.arange(len(owner)), -games, owner))
+        top_owner = owner[top_order]
+        rank_in_owner = np.arange(len(top_order)) - np.searchsorted(top_owner, top_owner)
+        top = top_order[rank_in_owner < 3]
+        top_champions = [[] for _ in self.puuids]
+        for o, c, g, w in zip(owner[top].tolist(), champ[top].tolist(), games[top].tolist(), champ_wins[top].tolist()):
+            top_champions[o].append({
+                'name': self.champion_names[c],
+                'games': g,
+                'win_rate': round((w / g * 100), 1) if g > 0 else 0
+            })
+
+        return {
+            puuid: {
+                'total_games': int(total_games[i]),
+                'win_rate': round(win_rate[i], 1),
+                'avg_kills': round(float(avg_kills[i]), 1),
+                'avg_deaths': round(float(avg_deaths[i]), 1),
+                'avg_assists': round(float(avg_assists[i]), 1),
+                'kda': round(kda[i], 2),
+                'cs_per_min': round(cs_per_min[i], 1),
+                'avg_vision': round(avg_vision[i], 1),
+                'avg_damage_share': round(avg_share[i], 1),
+                'avg_win_streak': round(avg_win_streak[i], 1) if has_win_streak[i] else 0,
+                'max_win_streak': max_win_streak[i],
+                'avg_loss_streak': round(avg_loss_streak[i], 1) if has_loss_streak[i] else 0,
+                'max_loss_streak': max_loss_streak[i],
+                'champion_diversity': round(diversity[i], 2),
+                'top_champions': top_champions[i]
+            }
+            for i, puuid in enumerate(self.puuids)
+        }
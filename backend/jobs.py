@@ -0,0 +1,156 @@
+import asyncio
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from metrics import JOB_QUEUE_SECONDS
+
+
+class QueueFullError(Exception):
+    """Raised when the scheduler can't accept any more jobs"""
+
+
+class Job:
+    """One analysis running in the background.
+
+    Every event the pipeline produces is kept in order, numbered from 1, so
+    any number of SSE connections can follow the job and a dropped one can
+    resume after the last event ID it saw.
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = 'queued'
+        self.events: List[Dict] = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.key = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status == 'done'
+
+    async def publish(self, event: Dict) -> None:
+        async with self._changed:
+            self.events.append(event)
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.status = 'done'
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    async def stream(self, after: int = 0) -> AsyncIterator[Tuple[int, Dict]]:
+        """Yield (event_id, event) for every event after `after`, until the job is done"""
+        next_id = after + 1
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: len(self.events) >= next_id or self.done)
+                batch = self.events[next_id - 1:]
+                finished = self.done
+
+            for event in batch:
+                yield next_id, event
+                next_id += 1
+
+            if finished and next_id > len(self.events):
+                return
+
+
+class JobScheduler:
+    """In-process scheduler for analysis jobs.
+
+    At most max_concurrency jobs run at once; the rest wait in a FIFO
+    queue of up to max_queue jobs and are told their queue position as it
+    changes. Finished jobs are kept for retention_seconds so clients can
+    reconnect and replay them.
+
+    Jobs submitted with a key are shared: while one is queued or running,
+    submitting the same key again returns it instead of starting another,
+    and each caller follows it from the first event.
+    """
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 50, retention_seconds: int = 300):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._queue: Deque[Tuple[Job, Callable[[], AsyncIterator[Dict]]]] = deque()
+        self._running = 0
+        self._keyed: Dict[Hashable, Job] = {}
+        self.coalesced = 0
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    async def submit(self, run: Callable[[], AsyncIterator[Dict]], key: Optional[Hashable] = None) -> Job:
+        """Queue a job; `run` is called when it starts and yields its events"""
+        if key is not None and key in self._keyed:
+            self.coalesced += 1
+            return self._keyed[key]
+
+        if len(self._queue) >= self.max_queue:
+            raise QueueFullError("Too many analyses in progress, try again shortly")
+
+        job = Job(uuid.uuid4().hex)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._keyed[key] = job
+            job.key = key
+        self._queue.append((job, run))
+        await job.publish({'job_id': job.id, 'status': 'queued'})
+        await self._start_next()
+        if job.status == 'queued':
+            position = len(self._queue)
+            await job.publish({
+                'progress': f'Waiting in queue (position {position})...',
+                'queue_position': position,
+                'status': 'queued'
+            })
+        return job
+
+    async def _start_next(self) -> None:
+        started = False
+        while self._queue and self._running < self.max_concurrency:
+            job, run = self._queue.popleft()
+            JOB_QUEUE_SECONDS.observe(time.time() - job.created_at)
+            job.status = 'running'
+            self._running += 1
+            asyncio.create_task(self._run(job, run))
+            started = True
+        if started:
+            await self._announce_positions()
+
+    async def _announce_positions(self) -> None:
+        for position, (job, _) in enumerate(self._queue, 1):
+            await job.publish({
+                'progress': f'Waiting in queue (position {position})...',
+                'queue_position': position,
+                'status': 'queued'
+            })
+
+    async def _run(self, job: Job, run: Callable[[], AsyncIterator[Dict]]) -> None:
+        try:
+            async for event in run():
+                await job.publish(event)
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            await job.publish({'error': str(e)})
+        finally:
+            if job.key is not None:
+                del self._keyed[job.key]
+            await job.finish()
+            self._running -= 1
+            asyncio.get_running_loop().call_later(self.retention_seconds, self._jobs.pop, job.id, None)
+            await self._start_next()
@@ -1,22 +1,34 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import os
 import json
 import time
 import asyncio
+import heapq
+import hashlib
+from contextlib import aclosing
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 
-from riot_api import RiotAPIClient, get_rank_tier
+from riot_api import AsyncRiotAPIClient, RiotClientPool, RequestContext, use_request_context, get_rank_tier
+from rate_limiter import RateLimiter, DEFAULT_APP_RATE_LIMIT
+from match_store import MatchStore
+from player_store import PlayerStatsStore
+from jobs import Job, JobScheduler, QueueFullError
 from analysis import (
-    calculate_player_stats,
+    StatsAccumulator,
     aggregate_stats,
-    detect_achievements
+    detect_achievements,
+    merge_player_stats
 )
 from bedrock_client import BedrockClient
+from bedrock_invoker import BedrockInvoker
+from cache import LookupCache, TTLCache
+from pregenerate import RoastPregenerator
+from metrics import ANALYSES, ANALYSIS_STAGE_SECONDS, StageTimer, registry as metrics_registry
 
 # Load environment variables
 load_dotenv()
@@ -34,15 +46,284 @@ app.add_middleware(
 )
 
 # Initialize clients
-riot_client = RiotAPIClient(
+# Set MATCH_STORE_PATH to an empty string to disable the on-disk match store
+match_store_path = os.getenv('MATCH_STORE_PATH', 'match_store.db')
+match_store = MatchStore(
+    match_store_path,
+    max_bytes=int(os.getenv('MATCH_STORE_MAX_MB', '512')) * 1024 * 1024
+) if match_store_path else None
+
+# Set PLAYER_STORE_PATH to an empty string to always re-analyze from scratch
+player_store_path = os.getenv('PLAYER_STORE_PATH', 'player_store.db')
+player_store = PlayerStatsStore(player_store_path) if player_store_path else None
+
+# One client per region; they share the rate limiter, match store and connections
+riot_clients = RiotClientPool(
     api_key=os.getenv('RIOT_API_KEY'),
-    region=os.getenv('DEFAULT_REGION', 'na1')
+    rate_limiter=RateLimiter(os.getenv('RIOT_APP_RATE_LIMIT', DEFAULT_APP_RATE_LIMIT)),
+    match_store=match_store,
+    # Riot ID -> PUUID, summoner and rank lookups, each for its own TTL (0 disables one)
+    lookup_cache=LookupCache(
+        ttls={
+            'account': float(os.getenv('RIOT_ACCOUNT_CACHE_TTL', '86400')),
+            'summoner': float(os.getenv('RIOT_SUMMONER_CACHE_TTL', '3600')),
+            'rank': float(os.getenv('RIOT_RANK_CACHE_TTL', '300'))
+        },
+        max_entries=int(os.getenv('RIOT_LOOKUP_CACHE_MAX_ENTRIES', '50000')),
+        max_bytes=int(os.getenv('RIOT_LOOKUP_CACHE_MAX_MB', '32')) * 1024 * 1024
+    )
 )
-bedrock_client = BedrockClient()
+DEFAULT_REGION = os.getenv('DEFAULT_REGION', 'na1')
+
+# Recent postcard generations, reused for identical stats (0 candidates disables it)
+bedrock_client = BedrockClient(
+    postcard_cache=TTLCache(
+        max_entries=int(os.getenv('POSTCARD_CACHE_MAX_ENTRIES', '1000')),
+        ttl_seconds=float(os.getenv('POSTCARD_CACHE_TTL_SECONDS', '3600'))
+    ),
+    cache_candidates=int(os.getenv('POSTCARD_CACHE_CANDIDATES', '3')),
+    # Bedrock calls run on their own worker pool, capped and backing off together when throttled
+    invoker=BedrockInvoker(
+        max_workers=int(os.getenv('BEDROCK_MAX_WORKERS', '8')),
+        max_in_flight=int(os.getenv('BEDROCK_MAX_IN_FLIGHT', '8')),
+        max_retries=int(os.getenv('BEDROCK_MAX_RETRIES', '4'))
+    ),
+    max_pool_connections=int(os.getenv('BEDROCK_MAX_POOL_CONNECTIONS', '10')),
+    # Past the deadline, template postcards are served while the model finishes
+    deadline_seconds=float(os.getenv('BEDROCK_DEADLINE_SECONDS', '10')),
+    swap_seconds=float(os.getenv('BEDROCK_SWAP_SECONDS', '20'))
+)
+
+# Next batch of postcards for clients that opt in, generated ahead of
+# "roast me again" (0 batches disables it)
+roast_pregenerator = RoastPregenerator(
+    bedrock_client,
+    max_batches=int(os.getenv('PREGENERATE_MAX_BATCHES', '3')),
+    max_in_flight=int(os.getenv('PREGENERATE_MAX_IN_FLIGHT', '4')),
+    idle_seconds=float(os.getenv('PREGENERATE_IDLE_SECONDS', '600'))
+)
+
+# Analyses run as background jobs; the rest wait in a bounded queue
+job_scheduler = JobScheduler(
+    max_concurrency=int(os.getenv('ANALYSIS_MAX_CONCURRENCY', '4')),
+    max_queue=int(os.getenv('ANALYSIS_MAX_QUEUE', '50')),
+    retention_seconds=int(os.getenv('ANALYSIS_RETENTION_SECONDS', '300'))
+)
+
+# Finished recaps by (PUUID, region, newest ranked match ID), served again
+# until they play another game (0 entries disables it)
+result_cache_entries = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '2000'))
+result_cache = TTLCache(
+    max_entries=result_cache_entries,
+    ttl_seconds=float(os.getenv('RESULT_CACHE_TTL_SECONDS', '3600'))
+) if result_cache_entries > 0 else None
+
+# Most ranked games listed per season, and how long we're willing to spend
+# fetching their details under the rate limits
+MAX_SEASON_MATCHES = int(os.getenv('MAX_SEASON_MATCHES', '500'))
+MATCH_FETCH_BUDGET_SECONDS = float(os.getenv('MATCH_FETCH_BUDGET_SECONDS', '90'))
+
+# Number of match detail requests allowed in flight per analysis
+MATCH_FETCH_CONCURRENCY = int(os.getenv('MATCH_FETCH_CONCURRENCY', '10'))
+
+# Most players in one group recap
+GROUP_MAX_MEMBERS = int(os.getenv('GROUP_MAX_MEMBERS', '5'))
+
+# Queue, pool and cache state for /metrics, read at scrape time
+metrics_registry.callback('rekappa_jobs_running', 'Analysis jobs running', lambda: job_scheduler.running)
+metrics_registry.callback('rekappa_jobs_queued', 'Analysis jobs waiting to start', lambda: job_scheduler.queue_depth)
+metrics_registry.callback('rekappa_jobs_coalesced_total', 'Requests that joined an identical job in progress',
+                          lambda: job_scheduler.coalesced, kind='counter')
+metrics_registry.callback('rekappa_riot_coalesced_total', 'Riot API calls answered by an identical request in flight',
+                          lambda: riot_clients.coalesced_requests, kind='counter')
+metrics_registry.callback('rekappa_lookup_cache_hits_total', 'Riot lookup cache hits by endpoint',
+                          lambda: {(endpoint,): stats['hits']
+                                   for endpoint, stats in riot_clients.lookup_cache.stats()['endpoints'].items()},
+                          kind='counter', labels=['endpoint'])
+metrics_registry.callback('rekappa_lookup_cache_misses_total', 'Riot lookup cache misses by endpoint',
+                          lambda: {(endpoint,): stats['misses']
+                                   for endpoint, stats in riot_clients.lookup_cache.stats()['endpoints'].items()},
+                          kind='counter', labels=['endpoint'])
+metrics_registry.callback('rekappa_result_cache_entries', 'Finished recaps cached',
+                          lambda: len(result_cache) if result_cache is not None else 0)
+metrics_registry.callback('rekappa_bedrock_in_flight', 'Bedrock calls open',
+                          lambda: bedrock_client.invoker.stats()['in_flight'])
+metrics_registry.callback('rekappa_bedrock_queue_depth', 'Bedrock work waiting for a worker or an in-flight slot',
+                          lambda: bedrock_client.invoker.queue_depth)
+metrics_registry.callback('rekappa_bedrock_throttled_total', 'Bedrock throttling errors',
+                          lambda: bedrock_client.invoker.throttled, kind='counter')
+metrics_registry.callback('rekappa_postcard_cache_served_total', 'Postcard requests answered from the cache',
+                          lambda: bedrock_client.cache_served, kind='counter')
+
+@app.on_event("shutdown")
+async def close_clients():
+    await riot_clients.aclose()
+    bedrock_client.invoker.shutdown()
+    if match_store:
+        match_store.close()
+    if player_store:
+        player_store.close()
+
+async def fetch_match_details(riot_client: AsyncRiotAPIClient, context: RequestContext, match_ids: List[str],
+                              puuids: List[str], concurrency: int = MATCH_FETCH_CONCURRENCY):
+    """Fetch match details with at most `concurrency` requests in flight.
+
+    Yields ('progress', completed, total, eta) as each match finishes,
+    ('pacing', eta) every second the rate limiter holds requests back, and
+    ('rate_limit', seconds_remaining) once per second while waiting out a 429.
+    eta is the rate limiter's predicted wait for the remaining matches.
+
+    Each ranked solo match is projected onto every player in puuids as soon
+    as it arrives and yielded as ('match', {puuid: record}) in the same order
+    as match_ids, which the streak logic in StatsAccumulator depends on.
+    Matches that finish early are held back only until the ones before them
+    arrive. Each match is fetched once however many of the players were in it.
+    A match that couldn't be fetched is yielded as ('failed', match_id).
+    """
+    fetched = {}
+    next_idx = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    total = len(match_ids)
+    completed = 0
+
+    async def fetch(idx, match_id):
+        async with semaphore:
+            # Don't fire more requests into an active rate limit window
+            if context.pending_rate_limit:
+                return idx, None
+            return idx, await riot_client.get_match_records(match_id, puuids)
+
+    to_fetch = list(range(total))
+    while to_fetch:
+        pending = {asyncio.create_task(fetch(idx, match_ids[idx])) for idx in to_fetch}
+        to_fetch = []
+
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+            eta = round(riot_client.predicted_match_details_wait(total - completed - len(done)))
+            if not done:
+                yield ('pacing', eta)
+                continue
+            for task in done:
+                idx, records = task.result()
+                if records is None and context.pending_rate_limit:
+                    # Rate limited (or skipped because of it) - retry after the wait
+                    to_fetch.append(idx)
+                    continue
+                fetched[idx] = records
+                completed += 1
+                while next_idx in fetched:
+                    records = fetched.pop(next_idx)
+                    next_idx += 1
+                    if records is None:
+                        yield ('failed', match_ids[next_idx - 1])
+                    elif records and next(iter(records.values())).queue_id == 420:  # Ranked Solo
+                        yield ('match', records)
+                yield ('progress', completed, total, eta)
+
+        if to_fetch:
+            wait_seconds = context.pending_rate_limit
+            print(f"[YIELD] Rate limited! Retrying {len(to_fetch)} matches in {wait_seconds}s...")
+            for remaining in range(wait_seconds, 0, -1):
+                yield ('rate_limit', remaining)
+                await asyncio.sleep(1)
+            context.pending_rate_limit = None
+            to_fetch.sort()
+
+def player_stats_record(match_ids: List[str], accumulator: StatsAccumulator, season_start: int,
+                        raw_stats: Dict, previous: Optional[Dict]) -> Dict:
+    """What the next incremental run needs; match_ids are newest first"""
+    fetched_any = accumulator.stats['total_games'] > 0
+    return {
+        'season_start': season_start,
+        'newest_match_id': match_ids[0],
+        'newest_game_start': accumulator.first_game_start if fetched_any else previous['newest_game_start'],
+        'newest_win': accumulator.first_win if fetched_any else previous['newest_win'],
+        'raw_stats': raw_stats
+    }
+
+async def cached_recap(riot_client: AsyncRiotAPIClient, puuid: str, region: str, season_start: int):
+    """(newest ranked match ID this season, the recap cached for it or None)"""
+    newest = await riot_client.get_match_ids(puuid, count=1, start_time=season_start)
+    if not newest:
+        return None, None
+    return newest[0], result_cache.get((puuid, region, newest[0])) if result_cache is not None else None
+
+def cache_recap(puuid: str, region: str, newest_match_id: Optional[str], result: Dict) -> None:
+    if result_cache is not None and newest_match_id:
+        result_cache.set((puuid, region, newest_match_id), dict(result))
+
+def recap_etag(puuid: str, region: str, newest_match_id: str) -> str:
+    """Weak ETag: same games, same recap (the postcards may be worded differently)"""
+    digest = hashlib.sha256(f"{puuid}:{region}:{newest_match_id}".encode()).hexdigest()[:32]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or etag[2:] in tags
+
+def start_roast_session(result: Dict) -> None:
+    """Start pre-generating the next batch for a result, adding its roast_session"""
+    roast_session = roast_pregenerator.start_session()
+    if roast_pregenerator.schedule(roast_session, result['your_stats'], result['your_rank'], result['achievements'],
+                                   result['used_topics'], result['sample_truncated']):
+        result['roast_session'] = roast_session
+
+def partial_stats(snapshot: Dict) -> Dict:
+    """The headline numbers from an in-progress snapshot, for progress events"""
+    return {
+        'total_games': snapshot['total_games'],
+        'win_rate': snapshot['win_rate'],
+        'kda': snapshot['kda'],
+        'top_champions': snapshot['top_champions']
+    }
+
+def merge_match_ids(match_id_lists: List[List[str]]) -> List[str]:
+    """Union of several newest-first match ID lists, still newest first.
+
+    Each list stays in its own order within the result, so every player's
+    games reach their accumulator in the order they were played. Between
+    lists, higher game IDs (newer matches) go first.
+    """
+    following = {}  # match ID -> IDs listed right after it somewhere
+    waiting = {}    # match ID -> number of IDs that have to come first
+    for match_ids in match_id_lists:
+        for i, match_id in enumerate(match_ids):
+            following.setdefault(match_id, set())
+            waiting.setdefault(match_id, 0)
+            if i and match_id not in following[match_ids[i - 1]]:
+                following[match_ids[i - 1]].add(match_id)
+                waiting[match_id] += 1
+
+    def newest_first(match_id):
+        game_id = match_id.rsplit('_', 1)[-1]
+        return (-int(game_id) if game_id.isdigit() else 0, match_id)
+
+    ready = [newest_first(match_id) for match_id, count in waiting.items() if count == 0]
+    heapq.heapify(ready)
+    merged = []
+    while ready:
+        _, match_id = heapq.heappop(ready)
+        merged.append(match_id)
+        for next_id in following[match_id]:
+            waiting[next_id] -= 1
+            if waiting[next_id] == 0:
+                heapq.heappush(ready, newest_first(next_id))
+
+    # Lists that disagree on order can't all be honoured; keep the leftovers anyway
+    merged.extend(match_id for match_id, count in waiting.items() if count > 0)
+    return merged
 
 class AnalysisRequest(BaseModel):
     summoner_name: str
     region: Optional[str] = "na1"
+    pregenerate: Optional[bool] = False  # Start on the next batch of roasts right away
+
+class GroupRecapRequest(BaseModel):
+    summoner_names: List[str]
+    region: Optional[str] = "na1"
 
 class PostcardResponse(BaseModel):
     status: str
@@ -57,8 +338,11 @@ async def root():
         "status": "running",
         "endpoints": {
             "analyze_stream": "/api/analyze-stream",
+            "resume_stream": "/api/analyze-stream/{job_id}",
+            "group_recap_stream": "/api/group-recap-stream",
             "regenerate": "/api/regenerate-roasts",
-            "health": "/health"
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -67,6 +351,11 @@ async def health():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: pipeline stages, Riot and Bedrock latency, rate limits, queues and caches"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.post("/regenerate-roasts")
 async def regenerate_roasts(request: dict):
     """Regenerate roasts from cached stats"""
@@ -74,22 +363,36 @@ async def regenerate_roasts(request: dict):
         your_stats = request.get('your_stats')
         your_rank = request.get('your_rank')
         achievements = request.get('achievements', [])
-        used_topics = request.get('used_topics', [])
+        used_topics = request.get('used_topics') or []
+        sample_truncated = request.get('sample_truncated')
+        roast_session = request.get('roast_session')
+
+        # A batch generated ahead of time if they opted in, otherwise a live call
+        batch = None
+        if roast_session:
+            batch = await roast_pregenerator.take(roast_session, your_stats, your_rank, achievements, used_topics,
+                                                  sample_truncated)
+        if batch:
+            postcards, new_topics = batch
+        else:
+            postcards, new_topics = await bedrock_client.generate_year_review_postcards_hedged(
+                your_stats,
+                your_rank,
+                achievements,
+                used_topics,
+                sample_truncated=sample_truncated
+            )
 
-        postcards, new_topics = bedrock_client.generate_year_review_postcards(
-            your_stats,
-            your_rank,
-            achievements,
-            used_topics
-        )
+        if roast_session:
+            roast_pregenerator.schedule(roast_session, your_stats, your_rank, achievements, used_topics + new_topics,
+                                        sample_truncated)
 
         return {"postcards": postcards, "used_topics": new_topics}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/analyze-stream")
-async def analyze_player_stream(request: AnalysisRequest):
-    """Streaming version with progress updates"""
+async def run_analysis(summoner_name: str, region: str):
+    """Full analysis pipeline, yielding progress events and finally the result"""
     rate_limit_message = {"message": None}
 
     def rate_limit_callback(seconds):
@@ -97,211 +400,515 @@ async def analyze_player_stream(request: AnalysisRequest):
         rate_limit_message["message"] = msg
         print(f"[CALLBACK] Rate limit callback triggered: {msg}")
 
-    async def generate():
-        try:
-            summoner_name = request.summoner_name
-            region = request.region or "na1"
-
-            # Set callback for rate limits
-            riot_client.rate_limit_callback = rate_limit_callback
-
-            # Update riot client region if needed
-            if region != riot_client.region:
-                riot_client.region = region
-                riot_client.base_url = f"https://{region}.api.riotgames.com"
-
-                # Update routing (account-v1 and match-v5 are different!)
-                account_routing = {
-                    'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-                    'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-                    'kr': 'asia', 'jp1': 'asia',
-                    'oc1': 'asia', 'sg2': 'asia', 'th2': 'asia', 'tw2': 'asia', 'vn2': 'asia', 'ph2': 'asia',
-                }
-                match_routing = {
-                    'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-                    'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-                    'kr': 'asia', 'jp1': 'asia',
-                    'oc1': 'sea', 'sg2': 'sea', 'th2': 'sea', 'tw2': 'sea', 'vn2': 'sea', 'ph2': 'sea',
-                }
-                riot_client.account_routing = account_routing.get(region, 'americas')
-                riot_client.match_routing = match_routing.get(region, 'americas')
-                riot_client.regional_url = f"https://{riot_client.match_routing}.api.riotgames.com"
-
-            yield f"data: {json.dumps({'progress': 'Looking up summoner...', 'status': 'running'})}\n\n"
-
-            # 1. Get summoner info
-            summoner = riot_client.get_summoner_by_name(summoner_name)
-            if not summoner:
-                yield f"data: {json.dumps({'error': f'Summoner not found. Use format: Name#TAG'})}\n\n"
-                return
-
-            if 'puuid' not in summoner:
-                yield f"data: {json.dumps({'error': 'Invalid summoner data received'})}\n\n"
-                return
-
-            puuid = summoner['puuid']
-
-            yield f"data: {json.dumps({'progress': 'Getting current rank...', 'status': 'running'})}\n\n"
-
-            # 2. Get current rank
-            rank_info = riot_client.get_rank_by_puuid(puuid)
-            your_rank = get_rank_tier(rank_info)
-
-            if not your_rank:
-                yield f"data: {json.dumps({'error': 'Player has no ranked games this season'})}\n\n"
-                return
-
-            yield f"data: {json.dumps({'progress': 'Fetching match history...', 'status': 'running'})}\n\n"
-
-            # 3. Get match history
-            start_of_year = int(datetime(2025, 1, 1).timestamp())
-            match_ids = riot_client.get_match_ids(puuid, count=100, start_time=start_of_year)
+    timer = StageTimer(ANALYSIS_STAGE_SECONDS)
+    outcome = 'error'
+    try:
+        riot_client = riot_clients.get(region)
+        if not riot_client:
+            yield {'error': f'Unsupported region: {region}'}
+            return
+
+        # Rate limit state for this request only
+        context = use_request_context(rate_limit_callback)
+
+        yield {'progress': 'Looking up summoner...', 'status': 'running'}
+
+        start_of_year = int(datetime(2025, 1, 1).timestamp())
+
+        async def list_match_ids(puuid):
+            """The cached recap if they haven't played since, else match history -
+            only games newer than the last run if we have one"""
+            newest_match_id, cached = await cached_recap(riot_client, puuid, region, start_of_year)
+            if cached:
+                return newest_match_id, cached, None, None
+
+            previous = await asyncio.to_thread(player_store.get, puuid) if player_store else None
+            if previous and previous.get('season_start') != start_of_year:
+                previous = None
+
+            list_from = previous['newest_game_start'] if previous else start_of_year
+            match_ids = await riot_client.get_all_match_ids(puuid, start_time=list_from, max_matches=MAX_SEASON_MATCHES)
             print(f"DEBUG: Found {len(match_ids)} matches from 2025. PUUID: {puuid}, Region: {region}, Match Routing: {riot_client.match_routing}")
+            return newest_match_id, None, previous, match_ids
+
+        # 1-3. Riot ID -> PUUID, then summoner, rank and match history side by side
+        async with aclosing(riot_client.lookup_player(summoner_name, list_match_ids)) as lookups:
+            async for step, result in lookups:
+                if step in ('account', 'summoner') and not result:
+                    yield {'error': f'Summoner not found. Use format: Name#TAG'}
+                    return
+                if step == 'account':
+                    timer.stage('account')
+                    puuid = result['puuid']
+                    yield {'progress': 'Getting current rank and match history...', 'status': 'running'}
+                elif step == 'rank':
+                    your_rank = get_rank_tier(result)
+                    if not your_rank:
+                        yield {'error': 'Player has no ranked games this season'}
+                        return
+                elif step == 'match_ids':
+                    newest_match_id, cached, previous, match_ids = result
+        timer.stage('lookups')
+
+        if cached:
+            # No games since the last recap - nothing to recompute
+            print(f"DEBUG: Serving cached recap for {puuid} (newest match {newest_match_id})")
+            outcome = 'cached'
+            yield {'result': dict(cached)}
+            return
+
+        if match_ids is None:
+            yield {'error': "Couldn't get the match history from Riot right now, try again in a minute"}
+            return
+
+        if previous:
+            if previous['newest_match_id'] in match_ids:
+                match_ids = match_ids[:match_ids.index(previous['newest_match_id'])]
+            elif len(match_ids) >= MAX_SEASON_MATCHES:
+                # Too many new games to be sure we haven't skipped any - start over
+                previous = None
+                match_ids = await riot_client.get_all_match_ids(puuid, start_time=start_of_year, max_matches=MAX_SEASON_MATCHES)
+                if match_ids is None:
+                    yield {'error': "Couldn't get the match history from Riot right now, try again in a minute"}
+                    return
+            print(f"DEBUG: {len(match_ids)} new matches since last analysis" if previous else "DEBUG: Re-analyzing from scratch")
+
+        if not previous and len(match_ids) < 10:
+            yield {'error': 'Not enough ranked games from 2025 (need at least 10)'}
+            return
+
+        # Only fetch as many details as the rate limits allow within the budget
+        planned = riot_client.plan_match_details(len(match_ids), MATCH_FETCH_BUDGET_SECONDS)
+        sample_truncated = len(match_ids) >= MAX_SEASON_MATCHES or planned < len(match_ids)
+        # A capped first run stays capped; folding in new games doesn't fill the gap
+        season_truncated = previous.get('sample_truncated', False) if previous else sample_truncated
+        # A capped incremental run leaves the newest games for next time, so its
+        # recap mustn't be cached under the player's newest match
+        caught_up = not previous or planned >= len(match_ids)
+        if planned < len(match_ids):
+            print(f"DEBUG: Rate budget allows {planned} of {len(match_ids)} match details")
+            # New games have to join up with the previous run, so keep the oldest ones then
+            match_ids = match_ids[len(match_ids) - planned:] if previous else match_ids[:planned]
+
+        # 4. Get match details with per-match progress, folding each one into
+        # the stats as it arrives
+        accumulator = StatsAccumulator(puuid)
+        total_matches = len(match_ids)
+        current_progress = ""
+        failed_matches = 0
+
+        def current_raw_stats():
+            """Stats so far, folded into the previous run's"""
+            if not previous:
+                return accumulator.raw_stats()
+            if accumulator.stats['total_games'] == 0:
+                return previous['raw_stats']
+            return merge_player_stats(
+                accumulator.raw_stats(),
+                previous['raw_stats'],
+                accumulator.last_win,
+                previous['newest_win']
+            )
+
+        async for event in fetch_match_details(riot_client, context, match_ids, [puuid]):
+            if event[0] == 'match':
+                accumulator.add(event[1][puuid])
+            elif event[0] == 'failed':
+                failed_matches += 1
+            elif event[0] == 'progress':
+                current_progress = f'Analyzing matches ({event[1]}/{total_matches})...'
+                partial = partial_stats(aggregate_stats(current_raw_stats()))
+                yield {'progress': current_progress, 'eta': event[3], 'partial': partial, 'status': 'running'}
+            elif event[0] == 'pacing':
+                rate_msg = f'Pacing requests to stay under Riot rate limits. About {event[1]}s left...' if event[1] >= 2 else None
+                yield {'progress': current_progress, 'rate_limit': rate_msg, 'eta': event[1], 'status': 'running'}
+            elif event[0] == 'rate_limit':
+                rate_msg = f'Rate limited. Waiting {event[1]}s...'
+                yield {'progress': current_progress, 'rate_limit': rate_msg, 'status': 'running'}
+        rate_limit_message["message"] = None
+        timer.stage('match_details')
+
+        your_raw_stats = current_raw_stats()
+
+        if your_raw_stats['total_games'] < 10:
+            yield {'error': 'Not enough valid ranked games found'}
+            return
+
+        # The next run only lists games after this one's newest, so a game
+        # missing from the middle would never be counted - don't save then
+        if failed_matches:
+            print(f"DEBUG: {failed_matches} match details failed, not saving {puuid} for incremental runs")
+        elif player_store and match_ids:
+            record = player_stats_record(match_ids, accumulator, start_of_year, your_raw_stats, previous)
+            # Carried forward, so a season cut short stays marked as such
+            record['sample_truncated'] = season_truncated
+            await asyncio.to_thread(player_store.put, puuid, record)
 
-            if len(match_ids) < 10:
-                yield f"data: {json.dumps({'error': 'Not enough ranked games from 2025 (need at least 10)'})}\n\n"
-                return
+        your_aggregated = aggregate_stats(your_raw_stats)
+        achievements = detect_achievements(your_raw_stats, your_aggregated)
+        timer.stage('stats')
+
+        yield {'progress': 'Generating roasts...', 'status': 'running'}
 
-            # 4. Get match details with per-match progress
-            matches = []
-            total_matches = min(len(match_ids), 100)
-            current_progress = ""
-            last_rate_limit_time = 0
+        # Generate postcards, sending each one as soon as the model finishes it
+        # (or template ones if it's too slow)
+        postcards, used_topics = [], []
+        postcard_stream = bedrock_client.stream_year_review_postcards_hedged(
+            your_aggregated,
+            your_rank,
+            achievements,
+            sample_truncated=sample_truncated or season_truncated
+        )
+        async for kind, value in postcard_stream:
+            if kind == 'postcard':
+                postcards.append(value)
+                yield {'postcard': value, 'your_rank': your_rank, 'status': 'running'}
+            elif kind == 'topics':
+                used_topics = value
+                yield {'topics': used_topics, 'status': 'running'}
+            elif kind == 'swap':
+                # The model caught up after template postcards went out
+                postcards, used_topics = value
+                yield {'swap_postcards': postcards, 'topics': used_topics, 'status': 'running'}
+        timer.stage('postcards')
+
+        # Send final result
+        result = {
+            'status': 'success',
+            'mode': 'year_review',
+            'your_rank': your_rank,
+            'your_stats': your_aggregated,
+            'achievements': achievements,
+            'postcards': postcards,
+            'used_topics': used_topics,
+            'sample_truncated': sample_truncated or season_truncated
+        }
+        if caught_up:
+            cache_recap(puuid, region, newest_match_id, result)
 
-            for idx, match_id in enumerate(match_ids[:100], 1):
-                current_progress = f'Analyzing matches ({idx}/{total_matches})...'
-                yield f"data: {json.dumps({'progress': current_progress, 'status': 'running'})}\n\n"
+        outcome = 'success'
+        yield {'result': result}
 
-                # Call get_match_details - it will return None immediately if rate limited
-                match_detail = riot_client.get_match_details(match_id)
+    except Exception as e:
+        yield {'error': str(e)}
+    finally:
+        timer.total()
+        ANALYSES.inc(outcome=outcome)
 
-                # Check if we got rate limited (riot_client.pending_rate_limit will be set)
-                if riot_client.pending_rate_limit:
-                    wait_seconds = riot_client.pending_rate_limit
-                    print(f"[YIELD] Rate limited! Showing countdown on frontend...")
+async def run_group_recap(summoner_names: List[str], region: str):
+    """Group recap pipeline: one recap per member, fetching shared matches once"""
+    def rate_limit_callback(seconds):
+        print(f"[CALLBACK] Rate limit callback triggered: Rate limited. Waiting {seconds}s...")
 
-                    # Countdown while yielding updates
-                    for remaining in range(wait_seconds, 0, -1):
-                        rate_msg = f'Rate limited. Waiting {remaining}s...'
-                        yield f"data: {json.dumps({'progress': current_progress, 'rate_limit': rate_msg, 'status': 'running'})}\n\n"
-                        time.sleep(1)
+    try:
+        riot_client = riot_clients.get(region)
+        if not riot_client:
+            yield {'error': f'Unsupported region: {region}'}
+            return
 
-                    # Clear the rate limit and retry the call
-                    riot_client.pending_rate_limit = None
-                    rate_limit_message["message"] = None
-                    match_detail = riot_client.get_match_details(match_id)
+        context = use_request_context(rate_limit_callback)
 
-                if match_detail and match_detail['info'].get('queueId') == 420:
-                    matches.append(match_detail)
+        yield {'progress': f'Looking up {len(summoner_names)} summoners...', 'status': 'running'}
 
-            if len(matches) < 10:
-                yield f"data: {json.dumps({'error': 'Not enough valid ranked games found'})}\n\n"
-                return
+        # 1. Resolve everyone at once
+        summoners = await asyncio.gather(*(riot_client.get_summoner_by_name(name) for name in summoner_names))
+        missing = [name for name, summoner in zip(summoner_names, summoners) if not summoner or 'puuid' not in summoner]
+        if missing:
+            yield {'error': f"Summoner not found: {', '.join(missing)}. Use format: Name#TAG"}
+            return
 
-            # Calculate stats
-            your_raw_stats = calculate_player_stats(matches, puuid)
-            your_aggregated = aggregate_stats(your_raw_stats)
-            achievements = detect_achievements(your_raw_stats, your_aggregated)
+        members = []
+        seen_puuids = set()
+        for name, summoner in zip(summoner_names, summoners):
+            if summoner['puuid'] not in seen_puuids:
+                seen_puuids.add(summoner['puuid'])
+                members.append({'summoner_name': name, 'puuid': summoner['puuid']})
 
-            yield f"data: {json.dumps({'progress': 'Generating roasts...', 'status': 'running'})}\n\n"
+        yield {'progress': 'Getting current ranks and match histories...', 'status': 'running'}
 
-            # Generate postcards
-            postcards, used_topics = bedrock_client.generate_year_review_postcards(
-                your_aggregated,
-                your_rank,
-                achievements
+        # 2. Ranks and match histories, all members and both lookups in parallel
+        start_of_year = int(datetime(2025, 1, 1).timestamp())
+        rank_infos, id_lists = await asyncio.gather(
+            asyncio.gather(*(riot_client.get_rank_by_puuid(m['puuid']) for m in members)),
+            asyncio.gather(*(
+                riot_client.get_all_match_ids(m['puuid'], start_time=start_of_year, max_matches=MAX_SEASON_MATCHES)
+                for m in members
+            ))
+        )
+        for member, rank_info, match_ids in zip(members, rank_infos, id_lists):
+            member['rank'] = get_rank_tier(rank_info)
+            member['match_ids'] = match_ids or []
+            if not member['rank']:
+                member['error'] = 'Player has no ranked games this season'
+            elif match_ids is None:
+                member['error'] = "Couldn't get the match history from Riot right now, try again in a minute"
+            elif len(match_ids) < 10:
+                member['error'] = 'Not enough ranked games from 2025 (need at least 10)'
+
+        active = [m for m in members if 'error' not in m]
+        if not active:
+            yield {'error': 'Nobody in the group has enough ranked games from 2025 (need at least 10)'}
+            return
+
+        # 3. Each distinct match is fetched once, newest first, within the rate budget
+        match_ids = merge_match_ids([m['match_ids'] for m in active])
+        shared = sum(len(m['match_ids']) for m in active) - len(match_ids)
+        planned = riot_client.plan_match_details(len(match_ids), MATCH_FETCH_BUDGET_SECONDS)
+        if planned < len(match_ids):
+            print(f"DEBUG: Rate budget allows {planned} of {len(match_ids)} group match details")
+            match_ids = match_ids[:planned]
+        print(f"DEBUG: Group of {len(active)} needs {len(match_ids)} matches ({shared} shared). Region: {region}")
+
+        planned_ids = set(match_ids)
+        for member in active:
+            member['listed'] = set(member['match_ids'])
+            member['total'] = sum(1 for match_id in member['match_ids'] if match_id in planned_ids)
+            member['sample_truncated'] = (len(member['match_ids']) >= MAX_SEASON_MATCHES or
+                                          member['total'] < len(member['match_ids']))
+
+        accumulators = {m['puuid']: StatsAccumulator(m['puuid']) for m in active}
+        listed = {m['puuid']: m['listed'] for m in active}
+
+        def member_progress():
+            progress = []
+            for member in active:
+                accumulator = accumulators[member['puuid']]
+                analyzed = accumulator.stats['total_games']
+                progress.append({
+                    'summoner_name': member['summoner_name'],
+                    'analyzed': analyzed,
+                    'total': member['total'],
+                    'partial': partial_stats(accumulator.snapshot()) if analyzed else None
+                })
+            return progress
+
+        total_matches = len(match_ids)
+        current_progress = ""
+        async for event in fetch_match_details(riot_client, context, match_ids, [m['puuid'] for m in active]):
+            if event[0] == 'match':
+                for puuid, record in event[1].items():
+                    # Only games from the member's own list (same season, queue and cap)
+                    if record.match_id in listed[puuid]:
+                        accumulators[puuid].add(record)
+            elif event[0] == 'progress':
+                current_progress = f'Analyzing group matches ({event[1]}/{total_matches})...'
+                yield {'progress': current_progress, 'eta': event[3], 'members': member_progress(), 'status': 'running'}
+            elif event[0] == 'pacing':
+                rate_msg = f'Pacing requests to stay under Riot rate limits. About {event[1]}s left...' if event[1] >= 2 else None
+                yield {'progress': current_progress, 'rate_limit': rate_msg, 'eta': event[1], 'status': 'running'}
+            elif event[0] == 'rate_limit':
+                rate_msg = f'Rate limited. Waiting {event[1]}s...'
+                yield {'progress': current_progress, 'rate_limit': rate_msg, 'status': 'running'}
+
+        # 4. Per-member stats, then everyone's postcards in parallel
+        for member in active:
+            raw_stats = accumulators[member['puuid']].raw_stats()
+            if raw_stats['total_games'] < 10:
+                member['error'] = 'Not enough valid ranked games found'
+                continue
+            member['stats'] = aggregate_stats(raw_stats)
+            member['achievements'] = detect_achievements(raw_stats, member['stats'])
+
+        roasted = [m for m in active if 'error' not in m]
+        yield {'progress': 'Generating roasts...', 'status': 'running'}
+
+        generated = await asyncio.gather(*(
+            bedrock_client.generate_year_review_postcards_hedged(
+                m['stats'],
+                m['rank'],
+                m['achievements'],
+                sample_truncated=m['sample_truncated']
             )
+            for m in roasted
+        ))
+        for member, (postcards, used_topics) in zip(roasted, generated):
+            member['postcards'] = postcards
+            member['used_topics'] = used_topics
+
+        recaps = []
+        for member in members:
+            if 'error' in member:
+                recaps.append({'summoner_name': member['summoner_name'], 'error': member['error']})
+                continue
+            recaps.append({
+                'summoner_name': member['summoner_name'],
+                'your_rank': member['rank'],
+                'your_stats': member['stats'],
+                'achievements': member['achievements'],
+                'postcards': member['postcards'],
+                'used_topics': member['used_topics'],
+                'sample_truncated': member['sample_truncated']
+            })
+
+        yield {'result': {
+            'status': 'success',
+            'mode': 'group_recap',
+            'members': recaps,
+            'matches_fetched': total_matches,
+            'shared_matches': shared
+        }}
+
+    except Exception as e:
+        yield {'error': str(e)}
+
+def queue_full_response(error: QueueFullError) -> StreamingResponse:
+    """A one-event SSE stream telling the client to come back later"""
+    busy = f"data: {json.dumps({'error': str(error)})}\n\n"
+    return StreamingResponse(iter([busy]), status_code=503, media_type="text/event-stream",
+                             headers={"Retry-After": "10"})
+
+@app.post("/analyze-stream")
+async def analyze_player_stream(request: AnalysisRequest):
+    """Streaming version with progress updates
+
+    The analysis runs as a background job; this stream follows it. Each
+    event carries an SSE id, and the first one carries the job_id, so a
+    dropped client can resume via GET /analyze-stream/{job_id}. A request
+    for a player who is already being analyzed follows that job, from its
+    first event, instead of starting another.
+    """
+    summoner_name = request.summoner_name
+    region = request.region or DEFAULT_REGION
+
+    # Everyone asking for the same player at once follows the same job,
+    # whether or not they typed the region's default tag
+    riot_client = riot_clients.get(region)
+    player = riot_client.riot_id_key(summoner_name.strip()) if riot_client else summoner_name.strip().lower()
+    key = ('analysis', region, player)
+    try:
+        job = await job_scheduler.submit(lambda: run_analysis(summoner_name, region), key)
+    except QueueFullError as e:
+        return queue_full_response(e)
+
+    return StreamingResponse(stream_job_events(job, pregenerate=bool(request.pregenerate)),
+                             media_type="text/event-stream")
+
+@app.post("/group-recap-stream")
+async def group_recap_stream(request: GroupRecapRequest):
+    """Streaming recap for a group of friends, one recap per member
 
-            # Send final result
-            result = {
-                'status': 'success',
-                'mode': 'year_review',
-                'your_rank': your_rank,
-                'your_stats': your_aggregated,
-                'achievements': achievements,
-                'postcards': postcards,
-                'used_topics': used_topics
-            }
+    Runs as a background job like /analyze-stream (and resumes through the
+    same GET /analyze-stream/{job_id}). Matches the members played together
+    are fetched once and counted for each of them.
+    """
+    region = request.region or DEFAULT_REGION
+
+    # Same Riot ID typed twice is the same member
+    summoner_names = []
+    for name in request.summoner_names:
+        name = name.strip()
+        if name and name.lower() not in (n.lower() for n in summoner_names):
+            summoner_names.append(name)
+
+    if not 2 <= len(summoner_names) <= GROUP_MAX_MEMBERS:
+        raise HTTPException(status_code=400, detail=f"A group needs 2 to {GROUP_MAX_MEMBERS} different summoners")
+
+    key = ('group_recap', region, tuple(sorted(name.lower() for name in summoner_names)))
+    try:
+        job = await job_scheduler.submit(lambda: run_group_recap(summoner_names, region), key)
+    except QueueFullError as e:
+        return queue_full_response(e)
 
-            yield f"data: {json.dumps({'result': result})}\n\n"
+    return StreamingResponse(stream_job_events(job), media_type="text/event-stream")
 
-        except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+@app.get("/analyze-stream/{job_id}")
+async def resume_analysis_stream(job_id: str, pregenerate: bool = False, last_event_id: Optional[str] = Header(None)):
+    """Reconnect to an in-flight (or recently finished) analysis job"""
+    job = job_scheduler.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
 
-    return StreamingResponse(generate(), media_type="text/event-stream")
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(stream_job_events(job, after, pregenerate), media_type="text/event-stream")
+
+async def stream_job_events(job: Job, after: int = 0, pregenerate: bool = False):
+    """Format a job's events as SSE, starting after event ID `after`
+
+    The job's events are shared by everyone following it, so each stream
+    that asked to pregenerate gets a roast session of its own on the result.
+    """
+    async for event_id, event in job.stream(after):
+        if pregenerate and 'result' in event:
+            event = dict(event, result=dict(event['result']))
+            start_roast_session(event['result'])
+        yield f"id: {event_id}\ndata: {json.dumps(event)}\n\n"
 
 @app.post("/analyze", response_model=PostcardResponse)
-async def analyze_player(request: AnalysisRequest):
+async def analyze_player(request: AnalysisRequest, response: Response, if_none_match: Optional[str] = Header(None)):
     """
     Main analysis endpoint
     Generates year-in-review OR pro comparison based on request
+
+    Responses carry an ETag that changes when the player finishes another
+    ranked game; sending it back as If-None-Match gets a 304 until then.
     """
     try:
         summoner_name = request.summoner_name
-        region = request.region or "na1"
-
-        # Update riot client region if needed
-        if region != riot_client.region:
-            riot_client.region = region
-            riot_client.base_url = f"https://{region}.api.riotgames.com"
-
-            # Update routing (account-v1 and match-v5 are different!)
-            account_routing = {
-                'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-                'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-                'kr': 'asia', 'jp1': 'asia',
-                'oc1': 'asia', 'sg2': 'asia', 'th2': 'asia', 'tw2': 'asia', 'vn2': 'asia', 'ph2': 'asia',
-            }
-            match_routing = {
-                'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-                'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-                'kr': 'asia', 'jp1': 'asia',
-                'oc1': 'sea', 'sg2': 'sea', 'th2': 'sea', 'tw2': 'sea', 'vn2': 'sea', 'ph2': 'sea',
-            }
-            riot_client.account_routing = account_routing.get(region, 'americas')
-            riot_client.match_routing = match_routing.get(region, 'americas')
-            riot_client.regional_url = f"https://{riot_client.match_routing}.api.riotgames.com"
+        region = request.region or DEFAULT_REGION
 
-        print(f"[1/5] Looking up summoner: {summoner_name}")
-        # 1. Get summoner info
-        summoner = riot_client.get_summoner_by_name(summoner_name)
-        if not summoner:
-            raise HTTPException(status_code=404, detail=f"Summoner '{summoner_name}' not found. Make sure to use format: Name#TAG (e.g., Doublelift#NA1)")
+        riot_client = riot_clients.get(region)
+        if not riot_client:
+            raise HTTPException(status_code=400, detail=f"Unsupported region: {region}")
 
-        if 'puuid' not in summoner:
-            raise HTTPException(status_code=500, detail=f"Invalid summoner data received. Keys: {list(summoner.keys())}")
+        # No callback: the client waits out 429s itself
+        context = use_request_context()
 
-        puuid = summoner['puuid']
+        print(f"[1/5] Looking up summoner: {summoner_name}")
+        start_of_year = int(datetime(2025, 1, 1).timestamp())
+
+        async def list_match_ids(puuid):
+            newest_match_id, cached = await cached_recap(riot_client, puuid, region, start_of_year)
+            if cached or (newest_match_id and etag_matches(if_none_match, recap_etag(puuid, region, newest_match_id))):
+                return newest_match_id, cached, None
+            match_ids = await riot_client.get_all_match_ids(puuid, start_time=start_of_year, max_matches=MAX_SEASON_MATCHES)
+            return newest_match_id, None, match_ids
+
+        # 1-3. Riot ID -> PUUID, then summoner, rank and match history side by side
+        print(f"[2/5] Getting current rank and match history...")
+        lookups = {step: result async for step, result in riot_client.lookup_player(summoner_name, list_match_ids)}
+        if not lookups['account'] or not lookups['summoner']:
+            raise HTTPException(status_code=404, detail=f"Summoner '{summoner_name}' not found. Make sure to use format: Name#TAG (e.g., Doublelift#NA1)")
 
-        # 2. Get current rank using PUUID directly
-        print(f"[2/5] Getting current rank...")
-        rank_info = riot_client.get_rank_by_puuid(puuid)
-        your_rank = get_rank_tier(rank_info)
+        puuid = lookups['account']['puuid']
+        your_rank = get_rank_tier(lookups['rank'])
 
         if not your_rank:
             raise HTTPException(status_code=400, detail="Player has no ranked games this season")
 
-        # 3. Get match history
-        print(f"[3/5] Fetching match history...")
-        start_of_year = int(datetime(2025, 1, 1).timestamp())
-        match_ids = riot_client.get_match_ids(puuid, count=100, start_time=start_of_year)
+        newest_match_id, cached, match_ids = lookups['match_ids']
+        if newest_match_id:
+            etag = recap_etag(puuid, region, newest_match_id)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={'ETag': etag})
+            response.headers['ETag'] = etag
+        if cached:
+            print(f"[3/5] No games since the last recap, serving it from the cache")
+            return PostcardResponse(**{field: cached[field] for field in PostcardResponse.model_fields})
+
+        if match_ids is None:
+            raise HTTPException(status_code=503, detail="Couldn't get the match history from Riot right now, try again in a minute")
+
+        print(f"[3/5] Found {len(match_ids)} ranked matches")
 
         if len(match_ids) < 10:
             raise HTTPException(status_code=400, detail="Not enough ranked games from 2025 (need at least 10)")
 
+        planned = riot_client.plan_match_details(len(match_ids), MATCH_FETCH_BUDGET_SECONDS)
+        sample_truncated = len(match_ids) >= MAX_SEASON_MATCHES or planned < len(match_ids)
+        match_ids = match_ids[:planned]
+
         # 4. Get match details
         print(f"[4/5] Analyzing {len(match_ids)} matches...")
-        matches = []
-        for match_id in match_ids[:100]:
-            match_detail = riot_client.get_match_details(match_id)
-            if match_detail and match_detail['info'].get('queueId') == 420:  # Ranked Solo
-                matches.append(match_detail)
+        accumulator = StatsAccumulator(puuid)
+        async for event in fetch_match_details(riot_client, context, match_ids, [puuid]):
+            if event[0] == 'match':
+                accumulator.add(event[1][puuid])
 
-        if len(matches) < 10:
+        if accumulator.stats['total_games'] < 10:
             raise HTTPException(status_code=400, detail="Not enough valid ranked games found")
 
         # Calculate your stats
-        your_raw_stats = calculate_player_stats(matches, puuid)
+        your_raw_stats = accumulator.raw_stats()
         your_aggregated = aggregate_stats(your_raw_stats)
 
         # Detect achievements/badges
@@ -309,11 +916,22 @@ async def analyze_player(request: AnalysisRequest):
 
         # Generate year review postcards
         print(f"[5/5] Generating year review postcards...")
-        postcards, _ = bedrock_client.generate_year_review_postcards(
+        postcards, used_topics = await bedrock_client.generate_year_review_postcards_hedged(
             your_aggregated,
             your_rank,
-            achievements
+            achievements,
+            sample_truncated=sample_truncated
         )
+        cache_recap(puuid, region, newest_match_id, {
+            'status': 'success',
+            'mode': 'year_review',
+            'your_rank': your_rank,
+            'your_stats': your_aggregated,
+            'achievements': achievements,
+            'postcards': postcards,
+            'used_topics': used_topics,
+            'sample_truncated': sample_truncated
+        })
 
         return PostcardResponse(
             status="success",
@@ -0,0 +1,97 @@
+from typing import Dict, Iterable, Optional
+
+import orjson
+
+
+class MatchRecord:
+    """The slice of a match-v5 payload that analysis needs, for one player.
+
+    A full match document carries ten participants with hundreds of fields
+    each; this keeps a dozen numbers for the player we're analyzing plus
+    their team's damage total, so the raw JSON can be dropped as soon as
+    it's been fetched.
+    """
+
+    __slots__ = (
+        'match_id', 'game_creation', 'game_duration', 'queue_id',
+        'team_id', 'win', 'champion_name',
+        'kills', 'deaths', 'assists',
+        'total_minions_killed', 'neutral_minions_killed',
+        'vision_score', 'damage_to_champions', 'team_damage',
+    )
+
+    def __init__(self, match_id: Optional[str], game_creation: int, game_duration: int, queue_id: Optional[int],
+                 team_id: Optional[int], win: bool, champion_name: str,
+                 kills: int, deaths: int, assists: int,
+                 total_minions_killed: int, neutral_minions_killed: int,
+                 vision_score: int, damage_to_champions: int, team_damage: int):
+        self.match_id = match_id
+        self.game_creation = game_creation
+        self.game_duration = game_duration
+        self.queue_id = queue_id
+        self.team_id = team_id
+        self.win = win
+        self.champion_name = champion_name
+        self.kills = kills
+        self.deaths = deaths
+        self.assists = assists
+        self.total_minions_killed = total_minions_killed
+        self.neutral_minions_killed = neutral_minions_killed
+        self.vision_score = vision_score
+        self.damage_to_champions = damage_to_champions
+        self.team_damage = team_damage
+
+    @classmethod
+    def from_participant(cls, match: Dict, player_data: Dict) -> 'MatchRecord':
+        info = match['info']
+        team_id = player_data.get('teamId')
+        team_damage = sum(p.get('totalDamageDealtToChampions', 0)
+                          for p in info['participants']
+                          if p.get('teamId') == team_id)
+        return cls(
+            match_id=match.get('metadata', {}).get('matchId'),
+            game_creation=info.get('gameCreation', 0),
+            game_duration=info.get('gameDuration', 0),
+            queue_id=info.get('queueId'),
+            team_id=team_id,
+            win=bool(player_data.get('win')),
+            champion_name=player_data.get('championName', 'Unknown'),
+            kills=player_data.get('kills', 0),
+            deaths=player_data.get('deaths', 0),
+            assists=player_data.get('assists', 0),
+            total_minions_killed=player_data.get('totalMinionsKilled', 0),
+            neutral_minions_killed=player_data.get('neutralMinionsKilled', 0),
+            vision_score=player_data.get('visionScore', 0),
+            damage_to_champions=player_data.get('totalDamageDealtToChampions', 0),
+            team_damage=team_damage,
+        )
+
+    @classmethod
+    def from_match(cls, match: Dict, puuid: str) -> Optional['MatchRecord']:
+        """Project a raw match onto one player (None if they aren't in it)"""
+        if not match or 'info' not in match:
+            return None
+
+        for p in match['info']['participants']:
+            if p.get('puuid') == puuid:
+                return cls.from_participant(match, p)
+
+        return None
+
+    @classmethod
+    def for_players(cls, match: Dict, puuids: Iterable[str]) -> Optional[Dict[str, 'MatchRecord']]:
+        """Project a raw match onto every one of puuids that played in it"""
+        if not match or 'info' not in match:
+            return None
+
+        wanted = set(puuids)
+        return {
+            p['puuid']: cls.from_participant(match, p)
+            for p in match['info']['participants']
+            if p.get('puuid') in wanted
+        }
+
+    @classmethod
+    def from_payload(cls, payload: bytes, puuids: Iterable[str]) -> Optional[Dict[str, 'MatchRecord']]:
+        """for_players straight from a match's raw JSON bytes"""
+        return cls.for_players(orjson.loads(payload), puuids)
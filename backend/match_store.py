@@ -0,0 +1,91 @@
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+
+class MatchStore:
+    """Durable on-disk store of raw match-v5 payloads, keyed by match ID.
+
+    A match never changes once the game is over, so anything we fetched
+    once (for this player or anyone they played with) can be served from
+    here instead of the API. Payloads are zlib-compressed in SQLite; when
+    the file grows past max_bytes the least recently read matches are
+    evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS matches ("
+            " match_id TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS matches_last_access ON matches (last_access)")
+        self._conn.commit()
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM matches").fetchone()[0]
+
+    def get(self, match_id: str) -> Optional[bytes]:
+        """Return the raw JSON bytes for a match, or None if we don't have it"""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE matches SET last_access = ? WHERE match_id = ?", (time.time(), match_id))
+            self._conn.commit()
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    def put(self, match_id: str, payload: bytes) -> None:
+        """Store the raw JSON bytes for a match, evicting old matches if over budget"""
+        compressed = zlib.compress(payload)
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM matches WHERE match_id = ?", (match_id,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO matches (match_id, payload, size, last_access) VALUES (?, ?, ?, ?)",
+                (match_id, compressed, len(compressed), time.time()),
+            )
+            self._total_bytes += len(compressed) - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop least recently read matches until we're back under 90% of the budget"""
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT match_id, size FROM matches ORDER BY last_access").fetchall()
+        for match_id, size in rows:
+            if self._total_bytes <= target:
+                break
+            self._conn.execute("DELETE FROM matches WHERE match_id = ?", (match_id,))
+            self._total_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0,
+            'evictions': self.evictions,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,208 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple, Union
+
+# Seconds; wide enough for a whole analysis waiting out rate limits
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            counts = self._values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0])
+            counts[0][bisect.bisect_left(self.buckets, value)] += 1
+            counts[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f'{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labels, key)} {total}')
+                lines.append(f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}')
+        return lines
+
+
+class CallbackMetric:
+    """A gauge or counter read from somewhere else (a stats() dict) at scrape time.
+
+    read returns a number, or {label values: number} if there are labels.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], Union[float, Dict[Tuple[str, ...], float]]],
+                 kind: str = 'gauge', labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.kind = kind
+        self.labels = tuple(labels)
+
+    def render(self) -> List[str]:
+        try:
+            values = self.read()
+        except Exception as e:
+            print(f"Metric {self.name} failed to read: {e}")
+            return []
+        if not isinstance(values, dict):
+            values = {(): values}
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics /metrics exposes, in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Union[Counter, Histogram, CallbackMetric]] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def callback(self, name: str, help: str, read: Callable, kind: str = 'gauge',
+                 labels: Sequence[str] = ()) -> CallbackMetric:
+        return self._register(CallbackMetric(name, help, read, kind, labels))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """Times the consecutive stages of one pipeline run into a histogram"""
+
+    def __init__(self, histogram: Histogram):
+        self.histogram = histogram
+        self.started = self._last = time.monotonic()
+
+    def stage(self, name: str) -> None:
+        """End the current stage (it started when the last one ended)"""
+        now = time.monotonic()
+        self.histogram.observe(now - self._last, stage=name)
+        self._last = now
+
+    def total(self) -> None:
+        self.histogram.observe(time.monotonic() - self.started, stage='total')
+
+registry = MetricsRegistry()
+
+ANALYSIS_STAGE_SECONDS = registry.histogram(
+    'rekappa_analysis_stage_seconds',
+    'Time spent in each stage of a streamed analysis',
+    ['stage']
+)
+ANALYSES = registry.counter(
+    'rekappa_analyses_total',
+    'Streamed analyses by outcome (success, cached or error)',
+    ['outcome']
+)
+JOB_QUEUE_SECONDS = registry.histogram(
+    'rekappa_job_queue_seconds',
+    'Time jobs waited in the queue before starting'
+)
+
+RIOT_REQUEST_SECONDS = registry.histogram(
+    'rekappa_riot_request_seconds',
+    'Riot API request latency by method',
+    ['endpoint'],
+    buckets=(0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+RIOT_RESPONSES = registry.counter(
+    'rekappa_riot_responses_total',
+    'Riot API responses by method and HTTP status (error for failed requests)',
+    ['endpoint', 'status']
+)
+RIOT_RATE_LIMITED = registry.counter(
+    'rekappa_riot_rate_limited_total',
+    'Riot API 429 responses by method',
+    ['endpoint']
+)
+RIOT_RETRY_AFTER_SECONDS = registry.counter(
+    'rekappa_riot_retry_after_seconds_total',
+    'Retry-After seconds Riot asked us to wait, by method',
+    ['endpoint']
+)
+
+BEDROCK_REQUEST_SECONDS = registry.histogram(
+    'rekappa_bedrock_request_seconds',
+    'Bedrock postcard generation latency by call type and outcome',
+    ['operation', 'outcome'],
+    buckets=(0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 60)
+)
+BEDROCK_FIRST_POSTCARD_SECONDS = registry.histogram(
+    'rekappa_bedrock_first_postcard_seconds',
+    'Time from a streamed Bedrock call to its first complete postcard',
+    buckets=(0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30)
+)
+BEDROCK_FALLBACKS = registry.counter(
+    'rekappa_bedrock_fallbacks_total',
+    'Template postcards served instead of the model, by reason (error or deadline)',
+    ['reason']
+)
+
@@ -0,0 +1,44 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+
+class PlayerStatsStore:
+    """Durable per-PUUID raw stats from the last analysis.
+
+    Each record holds the raw stats dict in the shape calculate_player_stats
+    produces, plus the newest match it covers, so a returning player only
+    needs the games played since then.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS player_stats ("
+            " puuid TEXT PRIMARY KEY,"
+            " record TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, puuid: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT record FROM player_stats WHERE puuid = ?", (puuid,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, puuid: str, record: Dict) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO player_stats (puuid, record, updated_at) VALUES (?, ?, ?)",
+                (puuid, json.dumps(record), time.time()),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
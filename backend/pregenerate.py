@@ -0,0 +1,118 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from bedrock_client import BedrockClient, postcard_cache_key
+
+
+class RoastPregenerator:
+    """Generates a session's next batch of postcards before they ask for it.
+
+    Most people hit "roast me again" at least once, so once a batch has been
+    delivered we start on the next one in the background, avoiding the
+    topics they've already seen, and park it in the session's slot.
+    /regenerate-roasts takes it from there if the stats and topics still
+    match.
+
+    Only one batch is ever parked per session and the next is only started
+    when that one is taken, so an idle session costs at most one generation.
+    Sessions get at most max_batches of them, at most max_in_flight run at
+    once across all sessions, and sessions idle for idle_seconds are dropped.
+    """
+
+    def __init__(self, bedrock_client: BedrockClient, max_batches: int = 3, max_in_flight: int = 4,
+                 idle_seconds: float = 600):
+        self.bedrock_client = bedrock_client
+        self.max_batches = max_batches
+        self.max_in_flight = max_in_flight
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self._sessions: Dict[str, Dict] = {}
+        self._in_flight = 0
+
+    def start_session(self) -> str:
+        self._expire_idle()
+        session_id = uuid.uuid4().hex
+        self._sessions[session_id] = {'batches': 0, 'slot': None, 'last_seen': time.monotonic()}
+        return session_id
+
+    def schedule(self, session_id: str, your_stats: Dict, your_rank: str, achievements: list,
+                 used_topics: List[str], sample_truncated: Optional[bool] = None) -> bool:
+        """Start generating the session's next batch; False if it's over budget"""
+        self._expire_idle()
+        session = self._sessions.get(session_id)
+        if not session or session['slot'] or session['batches'] >= self.max_batches:
+            return False
+        if self._in_flight >= self.max_in_flight:
+            return False
+
+        session['batches'] += 1
+        session['last_seen'] = time.monotonic()
+        self._in_flight += 1
+        session['slot'] = {
+            'key': self._key(your_stats, your_rank, achievements, used_topics, sample_truncated),
+            'task': asyncio.create_task(self._generate(your_stats, your_rank, achievements, used_topics, sample_truncated))
+        }
+        return True
+
+    async def take(self, session_id: str, your_stats: Dict, your_rank: str, achievements: list,
+                   used_topics: List[str], sample_truncated: Optional[bool] = None) -> Optional[Tuple[List[Dict], List[str]]]:
+        """The parked batch for exactly these inputs if it's ready, or None
+
+        A batch that's still being written isn't waited for: the caller's
+        live call joins the same generation under the deadline hedge, and
+        the finished batch lands in the postcard cache either way.
+        """
+        self._expire_idle()
+        session = self._sessions.get(session_id)
+        slot = session['slot'] if session else None
+        if not slot:
+            self.misses += 1
+            return None
+
+        session['slot'] = None
+        session['last_seen'] = time.monotonic()
+        if slot['key'] != self._key(your_stats, your_rank, achievements, used_topics, sample_truncated):
+            # Generated for something they're no longer asking for
+            self.misses += 1
+            return None
+
+        if not slot['task'].done():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return slot['task'].result()
+
+    def stats(self) -> Dict:
+        return {
+            'sessions': len(self._sessions),
+            'in_flight': self._in_flight,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _key(self, your_stats: Dict, your_rank: str, achievements: list, used_topics: List[str],
+             sample_truncated: Optional[bool]) -> str:
+        return postcard_cache_key(self.bedrock_client.model_id, your_stats, your_rank, achievements, used_topics,
+                                  sample_truncated)
+
+    async def _generate(self, your_stats: Dict, your_rank: str, achievements: list, used_topics: List[str],
+                        sample_truncated: Optional[bool]) -> Tuple[List[Dict], List[str]]:
+        try:
+            return await self.bedrock_client.generate_year_review_postcards_async(
+                your_stats,
+                your_rank,
+                achievements,
+                used_topics,
+                sample_truncated=sample_truncated
+            )
+        finally:
+            self._in_flight -= 1
+
+    def _expire_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_seconds
+        for session_id in [s for s, session in self._sessions.items() if session['last_seen'] < cutoff]:
+            del self._sessions[session_id]
@@ -0,0 +1,172 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+# Development key limits, used until Riot tells us the real ones
+DEFAULT_APP_RATE_LIMIT = "20:1,100:120"
+
+
+def parse_rate_limit_header(value: Optional[str]) -> List[Tuple[int, int]]:
+    """Parse a Riot rate limit header like "20:1,100:120" into (count, seconds) pairs"""
+    pairs = []
+    if not value:
+        return pairs
+
+    for part in value.split(','):
+        try:
+            count, seconds = part.strip().split(':')
+            pairs.append((int(count), int(seconds)))
+        except ValueError:
+            continue
+
+    return pairs
+
+
+class RateLimitWindow:
+    """One Riot rate limit window, e.g. 100 requests per 120 seconds.
+
+    Riot starts a window on the first request and resets the count when it
+    expires, so we track the count and reset time the same way.
+    """
+
+    def __init__(self, limit: int, seconds: int):
+        self.limit = limit
+        self.seconds = seconds
+        self.count = 0
+        self.reset_at = None
+        self.blocked_until = 0.0
+
+    def _roll(self, now: float) -> None:
+        if self.reset_at is not None and now >= self.reset_at:
+            self.count = 0
+            self.reset_at = None
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one more request fits in this window"""
+        self._roll(now)
+        blocked = max(self.blocked_until - now, 0)
+        if self.count >= self.limit:
+            return max(self.reset_at - now, blocked)
+        return blocked
+
+    def predicted_wait(self, requests: int, now: float) -> float:
+        """Seconds until `requests` more requests will all have been sent"""
+        self._roll(now)
+        blocked = max(self.blocked_until - now, 0)
+        overflow = self.count + requests - self.limit
+        if overflow <= 0:
+            return blocked
+        # Every full window we have to wait out frees up `limit` more requests
+        windows = (overflow + self.limit - 1) // self.limit
+        first_reset = (self.reset_at - now) if self.reset_at is not None else self.seconds
+        return max(first_reset + (windows - 1) * self.seconds, blocked)
+
+    def consume(self, now: float) -> None:
+        self._roll(now)
+        if self.reset_at is None:
+            self.reset_at = now + self.seconds
+        self.count += 1
+
+    def sync(self, count: int, now: float) -> None:
+        """Catch up with the count Riot reported (other workers share the key)"""
+        self._roll(now)
+        if count > self.count:
+            self.count = count
+            if self.reset_at is None:
+                self.reset_at = now + self.seconds
+
+    def block(self, seconds: float, now: float) -> None:
+        """Let nothing through for the next `seconds` (after a 429)
+
+        Only for those seconds: marking the window full instead would hold
+        a 10 minute window shut until it resets.
+        """
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """Proactive limiter for the Riot API, driven by the rate limit headers.
+
+    Riot enforces an application limit per routing host and a method limit
+    per host and endpoint. Both are learned from the X-App-Rate-Limit and
+    X-Method-Rate-Limit headers (plus their -Count headers) on every
+    response, and requests are only let through while every window they
+    count against still has room.
+    """
+
+    def __init__(self, default_app_limits: str = DEFAULT_APP_RATE_LIMIT):
+        self.default_app_limits = parse_rate_limit_header(default_app_limits)
+        self._app_windows: Dict[str, List[RateLimitWindow]] = {}
+        self._method_windows: Dict[Tuple[str, str], List[RateLimitWindow]] = {}
+        self._lock = threading.Lock()
+
+    def _windows_for(self, host: str, method: str) -> List[RateLimitWindow]:
+        if host not in self._app_windows:
+            self._app_windows[host] = [RateLimitWindow(limit, seconds) for limit, seconds in self.default_app_limits]
+        return self._app_windows[host] + self._method_windows.get((host, method), [])
+
+    def reserve(self, host: str, method: str) -> float:
+        """Claim a slot for one request.
+
+        Returns 0 if the request may go out now (and counts it), otherwise
+        the number of seconds to wait before asking again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            windows = self._windows_for(host, method)
+            wait = max((w.wait_time(now) for w in windows), default=0)
+            if wait > 0:
+                return wait
+            for window in windows:
+                window.consume(now)
+            return 0
+
+    def predicted_wait(self, host: str, method: str, requests: int = 1) -> float:
+        """Seconds until `requests` more calls to this method can all be sent"""
+        if requests <= 0:
+            return 0
+        with self._lock:
+            now = time.monotonic()
+            windows = self._windows_for(host, method)
+            return max((w.predicted_wait(requests, now) for w in windows), default=0)
+
+    def update(self, host: str, method: str, headers) -> None:
+        """Learn limits and current counts from a Riot response's headers"""
+        with self._lock:
+            now = time.monotonic()
+            self._windows_for(host, method)
+            app_limits = parse_rate_limit_header(headers.get('X-App-Rate-Limit'))
+            if app_limits:
+                self._app_windows[host] = self._apply_limits(self._app_windows.get(host, []), app_limits)
+            method_limits = parse_rate_limit_header(headers.get('X-Method-Rate-Limit'))
+            if method_limits:
+                self._method_windows[(host, method)] = self._apply_limits(
+                    self._method_windows.get((host, method), []), method_limits)
+
+            self._sync_counts(self._app_windows.get(host, []), headers.get('X-App-Rate-Limit-Count'), now)
+            self._sync_counts(self._method_windows.get((host, method), []), headers.get('X-Method-Rate-Limit-Count'), now)
+
+    def block(self, host: str, method: str, retry_after: float) -> None:
+        """Hold back every request for this host and method after a 429"""
+        with self._lock:
+            now = time.monotonic()
+            for window in self._windows_for(host, method):
+                window.block(retry_after, now)
+
+    @staticmethod
+    def _apply_limits(windows: List[RateLimitWindow], limits: List[Tuple[int, int]]) -> List[RateLimitWindow]:
+        """Rebuild the windows for new limits, keeping counts of unchanged windows"""
+        by_seconds = {w.seconds: w for w in windows}
+        result = []
+        for limit, seconds in limits:
+            window = by_seconds.get(seconds) or RateLimitWindow(limit, seconds)
+            window.limit = limit
+            result.append(window)
+        return result
+
+    @staticmethod
+    def _sync_counts(windows: List[RateLimitWindow], header: Optional[str], now: float) -> None:
+        counts = {seconds: count for count, seconds in parse_rate_limit_header(header)}
+        for window in windows:
+            if window.seconds in counts:
+                window.sync(counts[window.seconds], now)
@@ -1,64 +1,170 @@
 import requests
+import httpx
+import asyncio
 import os
-from typing import List, Dict, Optional
+import re
+import orjson
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
 import time
+from contextvars import ContextVar
+
+from rate_limiter import RateLimiter
+from match_store import MatchStore
+from match_record import MatchRecord
+from cache import LookupCache
+from task_graph import run_graph
+from metrics import RIOT_RATE_LIMITED, RIOT_REQUEST_SECONDS, RIOT_RESPONSES, RIOT_RETRY_AFTER_SECONDS
+
+# Seconds before an unanswered Riot API call is abandoned
+REQUEST_TIMEOUT = 10
+
+# Ranked Solo/Duo - the only queue we analyze
+RANKED_SOLO_QUEUE = 420
+
+# Most match IDs match-v5 returns per call
+MATCH_IDS_PAGE_SIZE = 100
+
+# Where calls go; {routing} is a platform (na1) or regional (americas) routing
+# value. RIOT_API_HOST_TEMPLATE points it elsewhere, e.g. a local stand-in
+DEFAULT_RIOT_API_HOST_TEMPLATE = "https://{routing}.api.riotgames.com"
+
+# Seconds lookups stay cached when no LookupCache is passed in: a Riot ID
+# rarely changes owner, a rank changes every game
+DEFAULT_LOOKUP_TTLS = {'account': 24 * 3600, 'summoner': 3600, 'rank': 300}
+
+# Riot method names, used to key the per-method rate limits
+_ENDPOINTS = [
+    (re.compile(r'^/riot/account/v1/accounts/by-riot-id/'), 'account-v1.getByRiotId'),
+    (re.compile(r'^/lol/summoner/v4/summoners/by-puuid/'), 'summoner-v4.getByPUUID'),
+    (re.compile(r'^/lol/match/v5/matches/by-puuid/[^/]+/ids'), 'match-v5.getMatchIdsByPUUID'),
+    (re.compile(r'^/lol/match/v5/matches/[^/]+$'), 'match-v5.getMatch'),
+    (re.compile(r'^/lol/league/v4/entries/by-summoner/'), 'league-v4.getLeagueEntriesForSummoner'),
+    (re.compile(r'^/lol/league/v4/entries/by-puuid/'), 'league-v4.getLeagueEntriesByPUUID'),
+    (re.compile(r'^/lol/champion-mastery/v4/champion-masteries/by-puuid/'), 'champion-mastery-v4.getAllChampionMasteriesByPUUID'),
+]
+
+# Routing for every supported platform - different for account-v1 vs match-v5!
+# account-v1: americas, asia, europe (3 values)
+# match-v5: americas, asia, europe, sea (4 values)
+REGIONS = {
+    'na1': {'account': 'americas', 'match': 'americas', 'default_tag': 'NA1'},
+    'br1': {'account': 'americas', 'match': 'americas', 'default_tag': 'BR1'},
+    'la1': {'account': 'americas', 'match': 'americas', 'default_tag': 'LAN'},
+    'la2': {'account': 'americas', 'match': 'americas', 'default_tag': 'LAS'},
+    'euw1': {'account': 'europe', 'match': 'europe', 'default_tag': 'EUW'},
+    'eun1': {'account': 'europe', 'match': 'europe', 'default_tag': 'EUNE'},
+    'tr1': {'account': 'europe', 'match': 'europe', 'default_tag': 'TR1'},
+    'ru': {'account': 'europe', 'match': 'europe', 'default_tag': 'RU'},
+    'kr': {'account': 'asia', 'match': 'asia', 'default_tag': 'KR'},
+    'jp1': {'account': 'asia', 'match': 'asia', 'default_tag': 'JP1'},
+    'oc1': {'account': 'asia', 'match': 'sea', 'default_tag': 'OCE'},
+    'sg2': {'account': 'asia', 'match': 'sea', 'default_tag': 'SG2'},
+    'th2': {'account': 'asia', 'match': 'sea', 'default_tag': 'TH2'},
+    'tw2': {'account': 'asia', 'match': 'sea', 'default_tag': 'TW2'},
+    'vn2': {'account': 'asia', 'match': 'sea', 'default_tag': 'VN2'},
+    'ph2': {'account': 'asia', 'match': 'sea', 'default_tag': 'PH2'},
+}
+
+class RequestContext:
+    """Rate limit state for one incoming request.
+
+    Clients are shared between concurrent requests, so the callback and the
+    pending 429 wait live here instead of on the client.
+    """
+
+    def __init__(self, rate_limit_callback=None):
+        self.rate_limit_callback = rate_limit_callback
+        self.pending_rate_limit = None  # Store seconds to wait
+
+_request_context: ContextVar[Optional[RequestContext]] = ContextVar('riot_request_context', default=None)
+
+def use_request_context(rate_limit_callback=None) -> RequestContext:
+    """Start a request context for the current task (and tasks it spawns)"""
+    context = RequestContext(rate_limit_callback)
+    _request_context.set(context)
+    return context
+
+def endpoint_for(url: str) -> Tuple[str, str]:
+    """Split a Riot API URL into (routing host, method name)"""
+    parts = urlsplit(url)
+    for pattern, method in _ENDPOINTS:
+        if pattern.match(parts.path):
+            return parts.netloc, method
+    return parts.netloc, parts.path
+
+def record_response(method: str, started: float, status, retry_after: int = 0) -> None:
+    """Count a Riot API response (or 'error' for a failed request) in the metrics"""
+    endpoint = method if not method.startswith('/') else 'other'
+    RIOT_REQUEST_SECONDS.observe(time.monotonic() - started, endpoint=endpoint)
+    RIOT_RESPONSES.inc(endpoint=endpoint, status=status)
+    if status == 429:
+        RIOT_RATE_LIMITED.inc(endpoint=endpoint)
+        RIOT_RETRY_AFTER_SECONDS.inc(retry_after, endpoint=endpoint)
 
 class RiotAPIClient:
-    def __init__(self, api_key: str, region: str = "na1", rate_limit_callback=None):
+    def __init__(self, api_key: str, region: str = "na1", rate_limit_callback=None,
+                 rate_limiter: Optional[RateLimiter] = None, match_store: Optional[MatchStore] = None,
+                 lookup_cache: Optional[LookupCache] = None):
         self.api_key = api_key
         self.region = region
         self.rate_limit_callback = rate_limit_callback
         self.pending_rate_limit = None  # Store seconds to wait
+        # Paces requests so we stay under the limits instead of hitting 429s
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # Finished matches never change, so details are read through this store
+        self.match_store = match_store
 
         # Regional routing - different for account-v1 vs match-v5!
-        # account-v1: americas, asia, europe (3 values)
-        # match-v5: americas, asia, europe, sea (4 values)
-
-        # Account API routing (for PUUID lookups)
-        account_routing = {
-            'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-            'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-            'kr': 'asia', 'jp1': 'asia',
-            'oc1': 'asia', 'sg2': 'asia', 'th2': 'asia', 'tw2': 'asia', 'vn2': 'asia', 'ph2': 'asia',
-        }
-
-        # Match API routing (for match history)
-        match_routing = {
-            'na1': 'americas', 'br1': 'americas', 'la1': 'americas', 'la2': 'americas',
-            'euw1': 'europe', 'eun1': 'europe', 'tr1': 'europe', 'ru': 'europe',
-            'kr': 'asia', 'jp1': 'asia',
-            'oc1': 'sea', 'sg2': 'sea', 'th2': 'sea', 'tw2': 'sea', 'vn2': 'sea', 'ph2': 'sea',
-        }
-
-        self.account_routing = account_routing.get(region, 'americas')
-        self.match_routing = match_routing.get(region, 'americas')
-        self.regional_url = f"https://{self.match_routing}.api.riotgames.com"
+        self.host_template = os.getenv('RIOT_API_HOST_TEMPLATE', DEFAULT_RIOT_API_HOST_TEMPLATE)
+        routing = REGIONS.get(region, REGIONS['na1'])
+        self.account_routing = routing['account']
+        self.match_routing = routing['match']
+        self.regional_url = self.host_template.format(routing=self.match_routing)
 
         # Platform endpoint (just use region directly)
-        self.base_url = f"https://{region}.api.riotgames.com"
+        self.base_url = self.host_template.format(routing=region)
         
-        # Cache for summoner IDs (since we need to get them from puuid now)
-        self._summoner_cache = {}
-        
-    def _make_request(self, url: str, retries: int = 3) -> Optional[Dict]:
-        """Make API request with retry logic"""
-        headers = {"X-Riot-Token": self.api_key}
+        # Account, summoner and rank lookups, each kept for its own TTL
+        self.lookup_cache = lookup_cache if lookup_cache is not None else LookupCache(DEFAULT_LOOKUP_TTLS)
+
+        # Keep-alive session so repeated calls reuse the same connections
+        self.session = requests.Session()
+        self.session.headers.update({"X-Riot-Token": self.api_key})
         
+    def _make_request(self, url: str, retries: int = 3, raw: bool = False):
+        """Make API request with retry logic (raw=True returns the body bytes)"""
+        host, method = endpoint_for(url)
+
         for attempt in range(retries):
             try:
-                response = requests.get(url, headers=headers)
+                wait = self.rate_limiter.reserve(host, method)
+                while wait > 0:
+                    time.sleep(wait)
+                    wait = self.rate_limiter.reserve(host, method)
+
+                started = time.monotonic()
+                try:
+                    response = self.session.get(url, timeout=REQUEST_TIMEOUT)
+                except Exception:
+                    record_response(method, started, 'error')
+                    raise
+                self.rate_limiter.update(host, method, response.headers)
+                retry_after = int(response.headers.get('Retry-After', 1)) if response.status_code == 429 else 0
+                record_response(method, started, response.status_code, retry_after)
                 
                 if response.status_code == 200:
-                    return response.json()
+                    return response.content if raw else response.json()
                 elif response.status_code == 429:  # Rate limit
-                    retry_after = int(response.headers.get('Retry-After', 1))
+                    self.rate_limiter.block(host, method, retry_after)
                     print(f"[RATE_LIMIT] Waiting {retry_after} seconds...")
-                    if self.rate_limit_callback:
+                    context = self._rate_limit_context()
+                    if context.rate_limit_callback:
                         # Store the rate limit info and return None immediately
                         # Main loop will handle the sleep and yielding
-                        self.pending_rate_limit = retry_after
-                        self.rate_limit_callback(retry_after)
+                        context.pending_rate_limit = retry_after
+                        context.rate_limit_callback(retry_after)
                         return None
                     else:
                         time.sleep(retry_after)
@@ -74,33 +180,129 @@ class RiotAPIClient:
         
         return None
     
+    def _rate_limit_context(self):
+        """The current request's context, or the client itself outside of one"""
+        return _request_context.get() or self
+
+    def predicted_wait(self, url: str, requests: int = 1) -> float:
+        """Seconds the rate limiter expects before `requests` calls like `url` can all go out"""
+        host, method = endpoint_for(url)
+        return self.rate_limiter.predicted_wait(host, method, requests)
+
+    def predicted_match_details_wait(self, requests: int) -> float:
+        """Seconds until `requests` more match detail calls can all go out"""
+        return self.predicted_wait(self._match_url('_'), requests)
+
+    def plan_match_details(self, available: int, time_budget: float) -> int:
+        """How many of `available` match details we can fetch within time_budget seconds"""
+        if self.predicted_match_details_wait(available) <= time_budget:
+            return available
+
+        # Predicted wait only grows with the number of requests, so bisect
+        low, high = 0, available
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.predicted_match_details_wait(mid) <= time_budget:
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    # URL builders shared by the sync and async clients
+
+    def _account_url(self, game_name: str, tag_line: str) -> str:
+        account_url = self.host_template.format(routing=self.account_routing)
+        return f"{account_url}/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
+
+    def _summoner_url(self, puuid: str) -> str:
+        return f"{self.base_url}/lol/summoner/v4/summoners/by-puuid/{puuid}"
+
+    def _match_ids_url(self, puuid: str, count: int, start_time: Optional[int], start: int = 0,
+                       queue: Optional[int] = RANKED_SOLO_QUEUE) -> str:
+        url = f"{self.regional_url}/lol/match/v5/matches/by-puuid/{puuid}/ids?start={start}&count={count}"
+        # Filter server-side so flex games never cost us a detail fetch
+        url += f"&queue={queue}" if queue else "&type=ranked"
+        if start_time:
+            url += f"&startTime={start_time}"
+        return url
+
+    def _match_url(self, match_id: str) -> str:
+        return f"{self.regional_url}/lol/match/v5/matches/{match_id}"
+
+    def _rank_url(self, summoner_id: str) -> str:
+        return f"{self.base_url}/lol/league/v4/entries/by-summoner/{summoner_id}"
+
+    def _rank_by_puuid_url(self, puuid: str) -> str:
+        return f"{self.base_url}/lol/league/v4/entries/by-puuid/{puuid}"
+
+    def _mastery_url(self, puuid: str) -> str:
+        return f"{self.base_url}/lol/champion-mastery/v4/champion-masteries/by-puuid/{puuid}"
+
+    def _split_riot_id(self, summoner_name: str) -> Tuple[str, str]:
+        """Split Name#TAG, falling back to the region's default tag"""
+        # Must be in Riot ID format (Name#TAG)
+        if '#' not in summoner_name:
+            # Add default tag based on region
+            tag = REGIONS.get(self.region, REGIONS['na1'])['default_tag']
+            summoner_name = f"{summoner_name}#{tag}"
+            print(f"INFO: No # found, trying with default tag: {summoner_name}")
+        
+        parts = summoner_name.split('#')
+        game_name = parts[0]
+        tag_line = parts[1] if len(parts) > 1 else 'NA1'
+        return game_name, tag_line
+
+    def _store_summoner(self, puuid: str, result: Dict) -> None:
+        """Flag a missing summoner ID and cache the summoner"""
+        # NEW: If 'id' is missing, we need to get it from league entries
+        if 'id' not in result:
+            # This is a workaround - get_summoner_id finds the encrypted ID in
+            # match history participants, but only once something asks for it
+            result['id'] = None  # Mark as unknown for now
+            result['_needs_id_lookup'] = True
+        
+        # Cache it
+        self.lookup_cache.set('summoner', (self.region, puuid), result)
+
+    def _apply_summoner_id(self, summoner: Dict, summoner_id: Optional[str]) -> None:
+        if summoner_id:
+            summoner['id'] = summoner_id
+            del summoner['_needs_id_lookup']
+            print(f"INFO: Successfully retrieved summoner ID from match history")
+        else:
+            print(f"WARNING: Could not retrieve summoner ID")
+
+    def riot_id_key(self, summoner_name: str) -> Tuple[str, str, str]:
+        """The same key for every way of typing one Riot ID (case, default tag)"""
+        return self._account_key(*self._split_riot_id(summoner_name))
+
+    def _account_key(self, game_name: str, tag_line: str) -> Tuple[str, str, str]:
+        # Riot IDs are case-insensitive, and shared by every region on the routing
+        return (self.account_routing, game_name.lower(), tag_line.lower())
+
     def get_account_by_riot_id(self, game_name: str, tag_line: str) -> Optional[Dict]:
         """Get account info by Riot ID (new format: GameName#TAG)"""
-        account_url = f"https://{self.account_routing}.api.riotgames.com"
-        url = f"{account_url}/riot/account/v1/accounts/by-riot-id/{game_name}/{tag_line}"
+        key = self._account_key(game_name, tag_line)
+        cached = self.lookup_cache.get('account', key)
+        if cached is not None:
+            return cached
+
+        url = self._account_url(game_name, tag_line)
         print(f"DEBUG: Calling account API: {url}")
-        return self._make_request(url)
+        result = self._make_request(url)
+        self.lookup_cache.set('account', key, result)
+        return result
     
     def get_summoner_by_puuid(self, puuid: str) -> Optional[Dict]:
-        """Get summoner info by PUUID - includes workaround for missing ID"""
+        """Get summoner info by PUUID - the ID may be missing, see get_summoner_id"""
         # Check cache first
-        if puuid in self._summoner_cache:
-            return self._summoner_cache[puuid]
-        
-        url = f"{self.base_url}/lol/summoner/v4/summoners/by-puuid/{puuid}"
-        result = self._make_request(url)
+        cached = self.lookup_cache.get('summoner', (self.region, puuid))
+        if cached is not None:
+            return cached
         
+        result = self._make_request(self._summoner_url(puuid))
         if result:
-            # NEW: If 'id' is missing, we need to get it from league entries
-            if 'id' not in result:
-                print(f"INFO: Summoner ID missing from API, fetching via alternative method...")
-                # Try to get it from league entries by searching with PUUID
-                # This is a workaround - we'll get the encrypted ID from match history participants
-                result['id'] = None  # Mark as unknown for now
-                result['_needs_id_lookup'] = True
-            
-            # Cache it
-            self._summoner_cache[puuid] = result
+            self._store_summoner(puuid, result)
         
         return result
     
@@ -116,83 +318,99 @@ class RiotAPIClient:
         if not match:
             return None
         
-        # Find the participant with this PUUID and get their summonerId
-        for participant in match['info']['participants']:
-            if participant.get('puuid') == puuid:
-                return participant.get('summonerId')
-        
-        return None
+        return find_summoner_id(match, puuid)
     
     def get_summoner_by_name(self, summoner_name: str) -> Optional[Dict]:
         """Get summoner info by name - handles Riot ID format (Name#TAG)"""
-        # Must be in Riot ID format (Name#TAG)
-        if '#' not in summoner_name:
-            # Add default tag based on region
-            default_tags = {
-                'na1': 'NA1',
-                'euw1': 'EUW',
-                'eun1': 'EUNE',
-                'kr': 'KR',
-                'br1': 'BR1',
-                'la1': 'LAN',
-                'la2': 'LAS',
-                'oc1': 'OCE',
-                'tr1': 'TR1',
-                'ru': 'RU',
-                'jp1': 'JP1',
-                'sg2': 'SG2',
-                'th2': 'TH2',
-                'tw2': 'TW2',
-                'vn2': 'VN2',
-                'ph2': 'PH2',
-            }
-            tag = default_tags.get(self.region, 'NA1')
-            summoner_name = f"{summoner_name}#{tag}"
-            print(f"INFO: No # found, trying with default tag: {summoner_name}")
-        
-        parts = summoner_name.split('#')
-        game_name = parts[0]
-        tag_line = parts[1] if len(parts) > 1 else 'NA1'
+        game_name, tag_line = self._split_riot_id(summoner_name)
         
         # Get account info (has PUUID)
         account = self.get_account_by_riot_id(game_name, tag_line)
         if not account:
             return None
         
-        puuid = account['puuid']
-        
-        # Get summoner info
+        return self.get_summoner_by_puuid(account['puuid'])
+    
+    def get_summoner_id(self, puuid: str) -> Optional[str]:
+        """Encrypted summoner ID, dug out of match history if summoner-v4 left it out"""
         summoner = self.get_summoner_by_puuid(puuid)
         if not summoner:
             return None
         
-        # If ID is missing, try to get it from a match
         if summoner.get('_needs_id_lookup'):
-            summoner_id = self.get_summoner_id_from_match(puuid)
-            if summoner_id:
-                summoner['id'] = summoner_id
-                del summoner['_needs_id_lookup']
-                print(f"INFO: Successfully retrieved summoner ID from match history")
-            else:
-                print(f"WARNING: Could not retrieve summoner ID")
+            print(f"INFO: Summoner ID missing from API, fetching via alternative method...")
+            self._apply_summoner_id(summoner, self.get_summoner_id_from_match(puuid))
         
-        return summoner
+        return summoner['id']
     
-    def get_match_ids(self, puuid: str, count: int = 100, start_time: Optional[int] = None) -> List[str]:
-        """Get match IDs for a player"""
-        url = f"{self.regional_url}/lol/match/v5/matches/by-puuid/{puuid}/ids?count={count}&type=ranked"
-        if start_time:
-            url += f"&startTime={start_time}"
+    def get_match_ids(self, puuid: str, count: int = 100, start_time: Optional[int] = None, start: int = 0,
+                      queue: Optional[int] = RANKED_SOLO_QUEUE) -> Optional[List[str]]:
+        """Get match IDs for a player (ranked solo/duo only unless queue=None)
 
+        Returns None if the request failed; [] means there really are none.
+        """
+        url = self._match_ids_url(puuid, count, start_time, start, queue)
         print(f"DEBUG: Fetching match IDs from: {url}")
         result = self._make_request(url)
         print(f"DEBUG: Got {len(result) if result else 0} match IDs")
-        return result if result else []
+        return result
+
+    def get_all_match_ids(self, puuid: str, start_time: Optional[int] = None, max_matches: int = 500,
+                          queue: Optional[int] = RANKED_SOLO_QUEUE, retries: int = 3) -> Optional[List[str]]:
+        """Page through a player's match IDs (newest first), up to max_matches
+
+        A page that was rate limited is fetched again after the wait. Returns
+        None if a page still couldn't be fetched, rather than a list that
+        stops short.
+        """
+        match_ids = []
+        attempts = 0
+        while len(match_ids) < max_matches:
+            count = min(MATCH_IDS_PAGE_SIZE, max_matches - len(match_ids))
+            page = self.get_match_ids(puuid, count=count, start_time=start_time, start=len(match_ids), queue=queue)
+            if page is None:
+                context = self._rate_limit_context()
+                retry_after = context.pending_rate_limit
+                attempts += 1
+                if not retry_after or attempts >= retries:
+                    print(f"Couldn't list match IDs for {puuid} past {len(match_ids)}")
+                    return None
+                time.sleep(retry_after)
+                context.pending_rate_limit = None
+                continue
+            attempts = 0
+            match_ids.extend(page)
+            # Only a full page means there may be more
+            if len(page) < count:
+                break
+        return match_ids
     
+    def get_match_payload(self, match_id: str) -> Optional[bytes]:
+        """Get a match's raw JSON bytes (read through the match store)"""
+        if self.match_store:
+            stored = self.match_store.get(match_id)
+            if stored is not None:
+                return stored
+
+        payload = self._make_request(self._match_url(match_id), raw=True)
+        if payload is not None and self.match_store:
+            self.match_store.put(match_id, payload)
+        return payload
+
     def get_match_details(self, match_id: str) -> Optional[Dict]:
-        """Get detailed match information"""
-        url = f"{self.regional_url}/lol/match/v5/matches/{match_id}"
-        return self._make_request(url)
+        """Get detailed match information (read through the match store)"""
+        payload = self.get_match_payload(match_id)
+        return orjson.loads(payload) if payload is not None else None
+    
+    def get_match_record(self, match_id: str, puuid: str) -> Optional[MatchRecord]:
+        """Get the slim per-player record of a match"""
+        records = self.get_match_records(match_id, [puuid])
+        return records.get(puuid) if records else None
+    
+    def get_match_records(self, match_id: str, puuids: List[str]) -> Optional[Dict[str, MatchRecord]]:
+        """Get one slim record per player in puuids who played the match"""
+        payload = self.get_match_payload(match_id)
+        return MatchRecord.from_payload(payload, puuids) if payload is not None else None
     
     def get_rank(self, summoner_id: str) -> Optional[List[Dict]]:
         """Get rank information for a summoner (OLD method, prefer get_rank_by_puuid)"""
@@ -200,8 +418,7 @@ class RiotAPIClient:
             print("ERROR: Cannot get rank - summoner ID is None")
             return None
         
-        url = f"{self.base_url}/lol/league/v4/entries/by-summoner/{summoner_id}"
-        return self._make_request(url)
+        return self._make_request(self._rank_url(summoner_id))
     
     def get_rank_by_puuid(self, puuid: str) -> Optional[List[Dict]]:
         """Get rank information using PUUID directly (NEW method - preferred)"""
@@ -209,13 +426,358 @@ class RiotAPIClient:
             print("ERROR: Cannot get rank - PUUID is None")
             return None
         
-        url = f"{self.base_url}/lol/league/v4/entries/by-puuid/{puuid}"
-        return self._make_request(url)
+        cached = self.lookup_cache.get('rank', (self.region, puuid))
+        if cached is not None:
+            return cached
+
+        result = self._make_request(self._rank_by_puuid_url(puuid))
+        self.lookup_cache.set('rank', (self.region, puuid), result)
+        return result
     
     def get_champion_mastery(self, puuid: str) -> Optional[List[Dict]]:
         """Get champion mastery for a player"""
-        url = f"{self.base_url}/lol/champion-mastery/v4/champion-masteries/by-puuid/{puuid}"
-        return self._make_request(url)
+        return self._make_request(self._mastery_url(puuid))
+
+class AsyncRiotAPIClient(RiotAPIClient):
+    """Awaitable version of RiotAPIClient for use inside async route handlers.
+
+    Exposes the same public methods as coroutines. Each routing host
+    (platform, account and match routing) gets its own pooled keep-alive
+    httpx client, so repeated calls skip the TCP+TLS handshake and never
+    block the event loop.
+    """
+
+    def __init__(self, api_key: str, region: str = "na1", rate_limit_callback=None,
+                 rate_limiter: Optional[RateLimiter] = None, match_store: Optional[MatchStore] = None,
+                 max_connections_per_host: int = 20, http_clients: Optional[Dict[str, httpx.AsyncClient]] = None,
+                 lookup_cache: Optional[LookupCache] = None, in_flight: Optional[Dict[Tuple[str, bool], asyncio.Future]] = None):
+        super().__init__(api_key, region, rate_limit_callback, rate_limiter, match_store, lookup_cache)
+        self.max_connections_per_host = max_connections_per_host
+        # Pools are keyed by host, so clients for different regions can share them
+        self._http_clients: Dict[str, httpx.AsyncClient] = http_clients if http_clients is not None else {}
+        # Requests on the wire, by (url, raw); shareable across regions like the pools
+        self._in_flight: Dict[Tuple[str, bool], asyncio.Future] = in_flight if in_flight is not None else {}
+        self.coalesced_requests = 0
+
+    def _http_client_for(self, url: str) -> httpx.AsyncClient:
+        """Get (or lazily open) the connection pool for the URL's host"""
+        host = urlsplit(url).netloc
+        client = self._http_clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                headers={"X-Riot-Token": self.api_key},
+                timeout=REQUEST_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections_per_host,
+                    max_keepalive_connections=self.max_connections_per_host,
+                ),
+            )
+            self._http_clients[host] = client
+        return client
+
+    async def aclose(self) -> None:
+        """Close all pooled connections"""
+        clients = list(self._http_clients.values())
+        self._http_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+    async def _make_request(self, url: str, retries: int = 3, raw: bool = False):
+        """Make API request with retry logic (raw=True returns the body bytes)
+
+        If the same request is already on the wire (a dozen viewers opening
+        the same profile), this waits for its response instead of spending
+        another call of the rate budget. Retries and 429 handling stay per
+        caller.
+        """
+        for attempt in range(retries):
+            try:
+                result, retry_after = await self._coalesced_get(url, raw)
+                if retry_after is None:
+                    return result
+
+                print(f"[RATE_LIMIT] Waiting {retry_after} seconds...")
+                context = self._rate_limit_context()
+                if context.rate_limit_callback:
+                    # Store the rate limit info and return None immediately
+                    # Main loop will handle the sleep and yielding
+                    context.pending_rate_limit = retry_after
+                    context.rate_limit_callback(retry_after)
+                    return None
+                else:
+                    await asyncio.sleep(retry_after)
+            except Exception as e:
+                print(f"Request failed (attempt {attempt + 1}): {e}")
+                if attempt < retries - 1:
+                    await asyncio.sleep(1)
+        
+        return None
+
+    async def _coalesced_get(self, url: str, raw: bool) -> Tuple[object, Optional[int]]:
+        key = (url, raw)
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._get(url, raw))
+            self._in_flight[key] = flight
+            flight.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced_requests += 1
+        # Shielded so one caller going away doesn't cancel it for the others
+        return await asyncio.shield(flight)
+
+    async def _get(self, url: str, raw: bool) -> Tuple[object, Optional[int]]:
+        """One GET within the rate limits: (result, None), or (None, retry_after) on a 429"""
+        client = self._http_client_for(url)
+        host, method = endpoint_for(url)
+
+        wait = self.rate_limiter.reserve(host, method)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.rate_limiter.reserve(host, method)
+
+        started = time.monotonic()
+        try:
+            response = await client.get(url)
+        except Exception:
+            record_response(method, started, 'error')
+            raise
+        self.rate_limiter.update(host, method, response.headers)
+        retry_after = int(response.headers.get('Retry-After', 1)) if response.status_code == 429 else 0
+        record_response(method, started, response.status_code, retry_after)
+
+        if response.status_code == 200:
+            return (response.content if raw else response.json()), None
+        elif response.status_code == 429:  # Rate limit
+            self.rate_limiter.block(host, method, retry_after)
+            return None, retry_after
+        elif response.status_code != 404:
+            print(f"Error {response.status_code}: {response.text}")
+        return None, None
+
+    async def get_account_by_riot_id(self, game_name: str, tag_line: str) -> Optional[Dict]:
+        """Get account info by Riot ID (new format: GameName#TAG)"""
+        key = self._account_key(game_name, tag_line)
+        cached = self.lookup_cache.get('account', key)
+        if cached is not None:
+            return cached
+
+        url = self._account_url(game_name, tag_line)
+        print(f"DEBUG: Calling account API: {url}")
+        result = await self._make_request(url)
+        self.lookup_cache.set('account', key, result)
+        return result
+
+    async def get_summoner_by_puuid(self, puuid: str) -> Optional[Dict]:
+        """Get summoner info by PUUID - the ID may be missing, see get_summoner_id"""
+        cached = self.lookup_cache.get('summoner', (self.region, puuid))
+        if cached is not None:
+            return cached
+
+        result = await self._make_request(self._summoner_url(puuid))
+        if result:
+            self._store_summoner(puuid, result)
+
+        return result
+
+    async def get_summoner_id_from_match(self, puuid: str) -> Optional[str]:
+        """Workaround: Get encrypted summoner ID from a recent match"""
+        match_ids = await self.get_match_ids(puuid, count=1)
+        if not match_ids:
+            return None
+
+        match = await self.get_match_details(match_ids[0])
+        if not match:
+            return None
+
+        return find_summoner_id(match, puuid)
+
+    async def get_summoner_by_name(self, summoner_name: str) -> Optional[Dict]:
+        """Get summoner info by name - handles Riot ID format (Name#TAG)"""
+        game_name, tag_line = self._split_riot_id(summoner_name)
+
+        account = await self.get_account_by_riot_id(game_name, tag_line)
+        if not account:
+            return None
+
+        return await self.get_summoner_by_puuid(account['puuid'])
+
+    async def get_summoner_id(self, puuid: str) -> Optional[str]:
+        """Encrypted summoner ID, dug out of match history if summoner-v4 left it out"""
+        summoner = await self.get_summoner_by_puuid(puuid)
+        if not summoner:
+            return None
+
+        if summoner.get('_needs_id_lookup'):
+            print(f"INFO: Summoner ID missing from API, fetching via alternative method...")
+            self._apply_summoner_id(summoner, await self.get_summoner_id_from_match(puuid))
+
+        return summoner['id']
+
+    def lookup_player(self, summoner_name: str,
+                      list_match_ids: Callable[[str], Awaitable]) -> AsyncIterator[Tuple[str, Any]]:
+        """Resolve a Riot ID, then run everything that only needs its PUUID at once.
+
+        Yields ('account' | 'summoner' | 'rank' | 'match_ids', result) as each
+        lookup finishes (see task_graph.run_graph); match_ids is whatever
+        list_match_ids(puuid) returns. The summoner lookup only confirms
+        they play in this region - nothing waits on it.
+        """
+        game_name, tag_line = self._split_riot_id(summoner_name)
+        return run_graph({
+            'account': ((), lambda: self.get_account_by_riot_id(game_name, tag_line)),
+            'summoner': (('account',), lambda account: self.get_summoner_by_puuid(account['puuid'])),
+            'rank': (('account',), lambda account: self.get_rank_by_puuid(account['puuid'])),
+            'match_ids': (('account',), lambda account: list_match_ids(account['puuid'])),
+        })
+
+    async def get_match_ids(self, puuid: str, count: int = 100, start_time: Optional[int] = None, start: int = 0,
+                            queue: Optional[int] = RANKED_SOLO_QUEUE) -> Optional[List[str]]:
+        """Get match IDs for a player (ranked solo/duo only unless queue=None)
+
+        Returns None if the request failed; [] means there really are none.
+        """
+        url = self._match_ids_url(puuid, count, start_time, start, queue)
+        print(f"DEBUG: Fetching match IDs from: {url}")
+        result = await self._make_request(url)
+        print(f"DEBUG: Got {len(result) if result else 0} match IDs")
+        return result
+
+    async def get_all_match_ids(self, puuid: str, start_time: Optional[int] = None, max_matches: int = 500,
+                                queue: Optional[int] = RANKED_SOLO_QUEUE, retries: int = 3) -> Optional[List[str]]:
+        """Page through a player's match IDs (newest first), up to max_matches
+
+        A page that was rate limited is fetched again after the wait. Returns
+        None if a page still couldn't be fetched, rather than a list that
+        stops short.
+        """
+        match_ids = []
+        attempts = 0
+        while len(match_ids) < max_matches:
+            count = min(MATCH_IDS_PAGE_SIZE, max_matches - len(match_ids))
+            page = await self.get_match_ids(puuid, count=count, start_time=start_time, start=len(match_ids), queue=queue)
+            if page is None:
+                context = self._rate_limit_context()
+                retry_after = context.pending_rate_limit
+                attempts += 1
+                if not retry_after or attempts >= retries:
+                    print(f"Couldn't list match IDs for {puuid} past {len(match_ids)}")
+                    return None
+                await asyncio.sleep(retry_after)
+                context.pending_rate_limit = None
+                continue
+            attempts = 0
+            match_ids.extend(page)
+            # Only a full page means there may be more
+            if len(page) < count:
+                break
+        return match_ids
+
+    async def get_match_payload(self, match_id: str) -> Optional[bytes]:
+        """Get a match's raw JSON bytes (read through the match store)"""
+        if self.match_store:
+            stored = await asyncio.to_thread(self.match_store.get, match_id)
+            if stored is not None:
+                return stored
+
+        payload = await self._make_request(self._match_url(match_id), raw=True)
+        if payload is not None and self.match_store:
+            await asyncio.to_thread(self.match_store.put, match_id, payload)
+        return payload
+
+    async def get_match_details(self, match_id: str) -> Optional[Dict]:
+        """Get detailed match information (read through the match store)"""
+        payload = await self.get_match_payload(match_id)
+        return orjson.loads(payload) if payload is not None else None
+
+    async def get_match_record(self, match_id: str, puuid: str) -> Optional[MatchRecord]:
+        """Get the slim per-player record of a match"""
+        records = await self.get_match_records(match_id, [puuid])
+        return records.get(puuid) if records else None
+
+    async def get_match_records(self, match_id: str, puuids: List[str]) -> Optional[Dict[str, MatchRecord]]:
+        """Get one slim record per player in puuids who played the match"""
+        payload = await self.get_match_payload(match_id)
+        return MatchRecord.from_payload(payload, puuids) if payload is not None else None
+
+    async def get_rank(self, summoner_id: str) -> Optional[List[Dict]]:
+        """Get rank information for a summoner (OLD method, prefer get_rank_by_puuid)"""
+        if not summoner_id:
+            print("ERROR: Cannot get rank - summoner ID is None")
+            return None
+
+        return await self._make_request(self._rank_url(summoner_id))
+
+    async def get_rank_by_puuid(self, puuid: str) -> Optional[List[Dict]]:
+        """Get rank information using PUUID directly (NEW method - preferred)"""
+        if not puuid:
+            print("ERROR: Cannot get rank - PUUID is None")
+            return None
+
+        cached = self.lookup_cache.get('rank', (self.region, puuid))
+        if cached is not None:
+            return cached
+
+        result = await self._make_request(self._rank_by_puuid_url(puuid))
+        self.lookup_cache.set('rank', (self.region, puuid), result)
+        return result
+
+    async def get_champion_mastery(self, puuid: str) -> Optional[List[Dict]]:
+        """Get champion mastery for a player"""
+        return await self._make_request(self._mastery_url(puuid))
+
+class RiotClientPool:
+    """One AsyncRiotAPIClient per region, built once from REGIONS.
+
+    The clients share the rate limiter, match store, lookup cache, per-host
+    connection pools and in-flight requests, and are never mutated per
+    request, so requests for different regions can run side by side.
+    """
+
+    def __init__(self, api_key: str, rate_limiter: Optional[RateLimiter] = None,
+                 match_store: Optional[MatchStore] = None, max_connections_per_host: int = 20,
+                 lookup_cache: Optional[LookupCache] = None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.match_store = match_store
+        self.lookup_cache = lookup_cache if lookup_cache is not None else LookupCache(DEFAULT_LOOKUP_TTLS)
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._in_flight: Dict[Tuple[str, bool], asyncio.Future] = {}
+        self._clients = {
+            region: AsyncRiotAPIClient(
+                api_key,
+                region=region,
+                rate_limiter=self.rate_limiter,
+                match_store=match_store,
+                max_connections_per_host=max_connections_per_host,
+                http_clients=self._http_clients,
+                lookup_cache=self.lookup_cache,
+                in_flight=self._in_flight,
+            )
+            for region in REGIONS
+        }
+
+    def get(self, region: str) -> Optional[AsyncRiotAPIClient]:
+        """Client for a platform region (e.g. 'na1'), or None if unsupported"""
+        return self._clients.get(region)
+
+    @property
+    def coalesced_requests(self) -> int:
+        """Calls that were answered by an identical request already in flight"""
+        return sum(client.coalesced_requests for client in self._clients.values())
+
+    async def aclose(self) -> None:
+        """Close the shared connection pools"""
+        clients = list(self._http_clients.values())
+        self._http_clients.clear()
+        for client in clients:
+            await client.aclose()
+
+def find_summoner_id(match: Dict, puuid: str) -> Optional[str]:
+    """Find the encrypted summoner ID of a PUUID among a match's participants"""
+    for participant in match['info']['participants']:
+        if participant.get('puuid') == puuid:
+            return participant.get('summonerId')
+    
+    return None
 
 def get_rank_tier(rank_info: List[Dict]) -> Optional[str]:
     """Extract ranked tier from rank info (for Ranked Solo/Duo)"""
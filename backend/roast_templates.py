@@ -0,0 +1,242 @@
+"""Local roast engine: postcards rendered from templates, no model involved.
+
+Each topic looks at the aggregate_stats output and returns the roasts that
+fit (or nothing if the stat isn't worth roasting); render_postcards picks a
+handful of topics the player hasn't seen yet and one roast for each. It
+answers instantly, so it backs up Bedrock when the model is slow or down.
+"""
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def _main_champ(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    champs = stats.get('top_champions') or []
+    if not champs:
+        return None
+    main = champs[0]
+    name, games, wr = main['name'], main['games'], main['win_rate']
+    title = f"{name.upper()} MAIN"
+    if wr < 45:
+        return [
+            (title, f"{wr}% winrate on {name} after {games} games. They said you couldn't do it. They were right."),
+            (title, f"{games} games of {name} at {wr}%. At some point it stops being practice and starts being a lifestyle."),
+            (title, f"Your {name} is {wr}% winrate. The enemy team says thanks for the {games} free games."),
+        ]
+    if wr >= 55:
+        return [
+            (title, f"{wr}% on {name} over {games} games. Imagine how good you'd be on a second champion. Actually, don't."),
+            (title, f"{games} games of {name}, {wr}% winrate. You found the one thing that works and refused to learn anything else."),
+        ]
+    return [
+        (title, f"{games} games on {name} and a {wr}% winrate. Perfectly balanced, as all mediocre things should be."),
+        (title, f"{wr}% on {name} across {games} games. Not good enough to brag about, not bad enough to quit."),
+    ]
+
+
+def _second_champ(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    champs = stats.get('top_champions') or []
+    if len(champs) < 2:
+        return None
+    second = champs[1]
+    name, games, wr = second['name'], second['games'], second['win_rate']
+    return [
+        ("THE BACKUP PLAN", f"{games} games on {name} at {wr}%. Every main needs a pocket pick. This is not it."),
+        ("PLAN B", f"When your main got banned you went {name}: {wr}% winrate in {games} games. The ban was doing you a favor."),
+    ]
+
+
+def _loss_streak(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    streak = stats.get('max_loss_streak', 0)
+    if streak < 3:
+        return None
+    return [
+        ("TILT QUEUE", f"Lost {streak} games in a row and queued up for number {streak + 1}. That's not int, that's commitment."),
+        ("THE SLIDE", f"{streak} losses in a row. At some point the common factor in all those games was you."),
+        ("ONE MORE GAME", f"{streak}-game losing streak. 'One more game' is a promise, not a threat."),
+    ]
+
+
+def _win_streak(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    streak = stats.get('max_win_streak', 0)
+    if streak < 3:
+        return None
+    return [
+        ("HOT STREAK", f"Best win streak: {streak} games. Enjoy it, it's in the past now."),
+        ("PEAK", f"You won {streak} in a row once. Your teammates were clearly having a good week."),
+    ]
+
+
+def _deaths(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    deaths = stats.get('avg_deaths', 0)
+    total = int(deaths * stats.get('total_games', 0))
+    if deaths >= 7:
+        return [
+            ("CHARITY WORK", f"{deaths} deaths per game. You're not feeding, you're running a charity buffet."),
+            ("GRAY SCREEN", f"About {total} deaths this year. You've spent more time watching the death timer than the map."),
+            ("RESPAWN ENJOYER", f"{deaths} deaths a game. The fountain knows you by name."),
+        ]
+    if deaths <= 4:
+        return [
+            ("SELF PRESERVATION", f"Only {deaths} deaths per game. Hard to die when you never show up to the fight."),
+        ]
+    return [
+        ("DEATH COUNT", f"{deaths} deaths per game. Not inting, just consistently donating."),
+    ]
+
+
+def _vision(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    vision = stats.get('avg_vision', 0)
+    if vision >= 30:
+        return None
+    return [
+        ("WARDS ARE FREE", f"{vision} vision score per game. The trinket is the yellow thing, in case you were wondering."),
+        ("FOG OF WAR", f"Averaging {vision} vision score. You play the whole map like it's a jump scare."),
+    ]
+
+
+def _cs(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    cs = stats.get('cs_per_min', 0)
+    if not cs:
+        return None
+    if cs < 6:
+        return [
+            ("MINION RIGHTS", f"{cs} CS per minute. The minions are grateful. Your gold isn't."),
+            ("FARMING SIMULATOR", f"{cs} CS/min. You treat the wave like it's somebody else's job."),
+        ]
+    if cs >= 8:
+        return [
+            ("FARM ANIMAL", f"{cs} CS per minute. Incredible farm. Shame the game is decided by the team that fights."),
+        ]
+    return [
+        ("CS CHECK", f"{cs} CS per minute. Not bad, not good, just there. Like a ward in a bush nobody walks through."),
+    ]
+
+
+def _kda(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    kda = stats.get('kda', 0)
+    wr = stats.get('win_rate', 0)
+    if kda > 3.5 and wr < 50:
+        return [
+            ("KDA PLAYER", f"{kda} KDA and a {wr}% winrate. Your stats won, your team didn't."),
+        ]
+    if kda < 2:
+        return [
+            ("KDA", f"{kda} KDA. That's not a ratio, that's a cry for help."),
+            ("THE MATH", f"{kda} KDA. Even your assists are embarrassed to be seen with your deaths."),
+        ]
+    return [
+        ("KDA", f"{kda} KDA. Respectable on paper. Games aren't played on paper."),
+    ]
+
+
+def _champion_pool(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    diversity = stats.get('champion_diversity', 0)
+    if diversity < 0.3:
+        return [
+            ("ONE TRICK", "Your champion pool is a puddle. One champion, all year, no regrets, plenty of losses."),
+        ]
+    if diversity > 0.8:
+        return [
+            ("CHAMPION ROULETTE", "Played a different champion every other game. Turns out the problem follows you around."),
+        ]
+    return None
+
+
+def _damage_share(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    share = stats.get('avg_damage_share', 0)
+    if not share:
+        return None
+    if share < 18:
+        return [
+            ("DAMAGE CHART", f"{share}% of your team's damage. You were in the game. Technically."),
+        ]
+    if share > 30:
+        return [
+            ("CARRY FANTASY", f"{share}% of your team's damage and they still lost with you. Imagine what that says about them. Or you."),
+        ]
+    return None
+
+
+def _games_played(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    games = stats.get('total_games', 0)
+    if not games:
+        return None
+    return [
+        ("DEDICATION", f"{games} ranked games in 2025. Rome wasn't built in a day, but it didn't take this long either."),
+        ("TIME WELL SPENT", f"{games} games this year. That's at least {games // 2} hours you're never getting back."),
+    ]
+
+
+def _win_rate(stats: Dict) -> Optional[List[Tuple[str, str]]]:
+    wr = stats.get('win_rate', 0)
+    if wr < 48:
+        return [
+            ("THE RECORD", f"{wr}% winrate. The ladder goes up too, you know."),
+            ("COIN FLIP", f"{wr}% winrate. A coin would have climbed higher."),
+        ]
+    if wr > 53:
+        return [
+            ("THE RECORD", f"{wr}% winrate. Winning more than you lose and still not out of your elo. Impressive, in a way."),
+        ]
+    return [
+        ("THE RECORD", f"{wr}% winrate. You are the human embodiment of 'even'."),
+    ]
+
+
+# topic name -> roasts that apply to these stats (or None)
+TOPICS: Dict[str, Callable[[Dict], Optional[List[Tuple[str, str]]]]] = {
+    'main_champ_winrate': _main_champ,
+    'second_champ': _second_champ,
+    'loss_streak': _loss_streak,
+    'win_streak': _win_streak,
+    'deaths': _deaths,
+    'vision': _vision,
+    'cs': _cs,
+    'kda': _kda,
+    'champion_pool': _champion_pool,
+    'damage_share': _damage_share,
+    'games_played': _games_played,
+    'win_rate': _win_rate,
+}
+
+
+def render_postcards(your_stats: Dict, your_rank: str, achievements: List[Dict], used_topics: List[str] = None,
+                     sample_truncated: bool = False, seed: Optional[int] = None) -> Tuple[List[Dict], List[str]]:
+    """Render 5-7 postcards from aggregate_stats output and achievement badges.
+
+    Same return shape as BedrockClient.generate_year_review_postcards:
+    (postcards, topics). Topics in used_topics are skipped while there are
+    enough others left. If the stats don't cover the whole season, the
+    game count isn't roasted.
+    """
+    rng = random.Random(seed)
+    used = set(used_topics or [])
+
+    candidates = {}
+    for topic, roasts in TOPICS.items():
+        if topic == 'games_played' and sample_truncated:
+            continue
+        options = roasts(your_stats)
+        if options:
+            candidates[topic] = options
+    for badge in achievements or []:
+        candidates[f"badge:{badge['name']}"] = [(badge['name'].upper(), f"Achievement unlocked: {badge['description']}.")]
+
+    fresh = [t for t in candidates if t not in used]
+    stale = [t for t in candidates if t in used]
+    rng.shuffle(fresh)
+    rng.shuffle(stale)
+    count = rng.randint(4, 6)  # Plus the intro card
+    topics = (fresh + stale)[:count]
+
+    postcards = [{
+        "title": "2025 RECAP",
+        "content": f"{your_stats.get('total_games', 0)} games. {your_stats.get('win_rate', 0)}% winrate. {your_rank}. Let's talk about it.",
+        "stat": f"{your_rank}",
+        "type": "stat"
+    }]
+    for topic in topics:
+        title, content = rng.choice(candidates[topic])
+        postcards.append({"title": title, "content": content, "type": "roast"})
+
+    return postcards, topics
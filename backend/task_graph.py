@@ -0,0 +1,42 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Sequence, Tuple
+
+# step name -> (names of the steps it needs, fn called with their results)
+Graph = Dict[str, Tuple[Sequence[str], Callable[..., Awaitable]]]
+
+
+async def run_graph(steps: Graph) -> AsyncIterator[Tuple[str, Any]]:
+    """Run async steps as soon as the steps they depend on have finished.
+
+    Yields (name, result) as each step finishes. A step is skipped (its
+    result is None) if anything it depends on came back None, so a failed
+    lookup doesn't set off the ones that need it. Closing the generator
+    early cancels whatever is still running.
+    """
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(needs, fn):
+        results = await asyncio.gather(*needs)
+        if any(result is None for result in results):
+            return None
+        return await fn(*results)
+
+    def start(name: str) -> asyncio.Task:
+        if name not in tasks:
+            needs, fn = steps[name]
+            tasks[name] = asyncio.ensure_future(run([start(need) for need in needs], fn))
+        return tasks[name]
+
+    for name in steps:
+        start(name)
+    names = {task: name for name, task in tasks.items()}
+    pending = set(tasks.values())
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Same-time finishers come out in declaration order
+            for task in sorted(done, key=lambda t: list(steps).index(names[t])):
+                yield names[task], task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -9,6 +9,7 @@ function App() {
   const [error, setError] = useState(null);
   const [progressMessage, setProgressMessage] = useState('');
   const [rateLimitMessage, setRateLimitMessage] = useState('');
+  const [partialStats, setPartialStats] = useState(null);
 
   const getRankClass = (rank) => {
     if (!rank) return 'gold';
@@ -32,6 +33,7 @@ function App() {
     setResults(null);
     setProgressMessage('Starting...');
     setRateLimitMessage('');
+    setPartialStats(null);
 
     // Save last search
     sessionStorage.setItem('lastSearch', JSON.stringify({ summonerName, region }));
@@ -59,7 +61,9 @@ function App() {
             your_stats: cachedData.your_stats,
             your_rank: cachedData.your_rank,
             achievements: cachedData.achievements,
-            used_topics: usedTopics
+            used_topics: usedTopics,
+            sample_truncated: cachedData.sample_truncated,
+            roast_session: cachedData.roast_session
           }),
         });
 
@@ -80,11 +84,13 @@ function App() {
 
       const requestBody = {
         summoner_name: summonerName,
-        region: region
+        region: region,
+        // Have the next batch of roasts ready before "roast me again"
+        pregenerate: true
       };
 
       // Use fetch with streaming
-      const response = await fetch('/api/analyze-stream', {
+      let response = await fetch('/api/analyze-stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -92,25 +98,56 @@ function App() {
         body: JSON.stringify(requestBody),
       });
 
-      const reader = response.body.getReader();
-      const decoder = new TextDecoder();
+      // The analysis keeps running server-side, so a dropped stream can resume
+      let jobId = null;
+      let lastEventId = null;
+      let reconnects = 0;
 
       while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
-
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n\n');
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+          let chunk;
+          try {
+            chunk = await reader.read();
+          } catch (e) {
+            console.error('Stream interrupted:', e);
+            break;
+          }
+          if (chunk.done) break;
+
+          buffer += decoder.decode(chunk.value, { stream: true });
+          const events = buffer.split('\n\n');
+          buffer = events.pop();
+
+          for (const event of events) {
+            let payload = null;
+            for (const line of event.split('\n')) {
+              if (line.startsWith('id: ')) {
+                lastEventId = line.substring(4);
+              } else if (line.startsWith('data: ')) {
+                payload = line.substring(6);
+              }
+            }
+            if (!payload) continue;
 
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
             try {
-              const data = JSON.parse(line.substring(6));
+              const data = JSON.parse(payload);
+
+              if (data.job_id) {
+                jobId = data.job_id;
+              }
 
               if (data.progress) {
                 setProgressMessage(data.progress);
               }
 
+              if (data.partial) {
+                setPartialStats(data.partial);
+              }
+
               if (data.rate_limit) {
                 setRateLimitMessage(data.rate_limit);
               } else {
@@ -123,6 +160,19 @@ function App() {
                 return;
               }
 
+              // Postcards arrive one at a time while the rest are still being written
+              if (data.postcard) {
+                setResults(prev => ({
+                  your_rank: data.your_rank,
+                  postcards: [...(prev ? prev.postcards : []), data.postcard]
+                }));
+              }
+
+              // The model's postcards replacing the quick template ones
+              if (data.swap_postcards) {
+                setResults(prev => ({ ...prev, postcards: data.swap_postcards }));
+              }
+
               if (data.result) {
                 setResults(data.result);
 
@@ -132,7 +182,9 @@ function App() {
                   your_stats: data.result.your_stats,
                   your_rank: data.result.your_rank,
                   achievements: data.result.achievements || [],
-                  used_topics: data.result.used_topics || []
+                  used_topics: data.result.used_topics || [],
+                  sample_truncated: data.result.sample_truncated,
+                  roast_session: data.result.roast_session
                 };
                 sessionStorage.setItem(cacheKey, JSON.stringify(cacheData));
 
@@ -145,8 +197,19 @@ function App() {
             }
           }
         }
+
+        // Stream ended without a result - pick the job up where we left off
+        if (!jobId || reconnects >= 3) break;
+        reconnects += 1;
+        response = await fetch(`/api/analyze-stream/${jobId}?pregenerate=true`, {
+          headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {},
+        });
+        if (!response.ok) break;
       }
 
+      setError('Lost connection to the server. Please try again.');
+      setLoading(false);
+
     } catch (err) {
       setError(err.message);
       setLoading(false);
@@ -180,6 +243,12 @@ function App() {
             {rateLimitMessage && (
               <p className="rate-limit-message">{rateLimitMessage}</p>
             )}
+            {partialStats && partialStats.total_games > 0 && (
+              <p className="loading-detail">
+                So far: {partialStats.total_games} games, {partialStats.win_rate}% WR, {partialStats.kda} KDA
+                {partialStats.top_champions.length > 0 && `, mostly ${partialStats.top_champions[0].name}`}
+              </p>
+            )}
             <p className="loading-detail">This may take 1-2 minutes</p>
           </div>
         )}